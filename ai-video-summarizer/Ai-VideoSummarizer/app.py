@@ -6,6 +6,10 @@ from datetime import datetime
 from flask import Flask, request, jsonify, render_template, session
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text, or_, and_, inspect, event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import undefer, make_transient_to_detached
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from openai import OpenAI
@@ -14,6 +18,20 @@ import nltk
 from fpdf import FPDF
 import tempfile
 import logging
+import math
+import zlib
+import hashlib
+import time
+import queue
+import atexit
+import threading
+from collections import Counter, OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 # the newest OpenAI model is "gpt-5" which was released August 7, 2025.
 # do not change this unless explicitly requested by the user
@@ -34,6 +52,13 @@ logger = logging.getLogger(__name__)
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 openai_client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
 
+AI_EXECUTOR = ThreadPoolExecutor(max_workers=int(os.environ.get('AI_MAX_WORKERS', 8)), thread_name_prefix='ai')
+AI_TASK_TIMEOUT = float(os.environ.get('AI_TASK_TIMEOUT', 45))
+
+# Bump when prompts or models change so new requests stop reusing results
+# produced by the old generator.
+GENERATOR_VERSION = os.environ.get('GENERATOR_VERSION', 'gpt-5:v1')
+
 try:
     nltk.data.find('tokenizers/punkt')
 except LookupError:
@@ -57,14 +82,29 @@ class User(UserMixin, db.Model):
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
+class VideoResult(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    video_id = db.Column(db.String(64), nullable=False)
+    generator_version = db.Column(db.String(64), nullable=False)
+    title = db.Column(db.String(500), nullable=False)
+    duration = db.Column(db.Integer)
+    codec = db.Column(db.String(8), nullable=False)
+    summary_blob = db.Column(db.LargeBinary, nullable=False)
+    quiz_blob = db.Column(db.LargeBinary, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    __table_args__ = (db.UniqueConstraint('video_id', 'generator_version', name='uq_video_result_version'),)
+
 class History(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     title = db.Column(db.String(500), nullable=False)
     video_url = db.Column(db.String(1000))
-    summary = db.Column(db.Text)
-    quiz_data = db.Column(db.Text)
+    # Legacy rows keep their own JSON; new rows point at a shared VideoResult.
+    summary = db.deferred(db.Column(db.Text))
+    quiz_data = db.deferred(db.Column(db.Text))
+    result_id = db.Column(db.Integer, db.ForeignKey('video_result.id'), nullable=True, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    __table_args__ = (db.Index('ix_history_user_created', 'user_id', 'created_at', 'id'),)
 
 class ChatHistory(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -73,12 +113,237 @@ class ChatHistory(db.Model):
     response = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+class HistoryPassage(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    history_id = db.Column(db.Integer, db.ForeignKey('history.id'), nullable=False, index=True)
+    # Passage number within its History row; NULL on rows written before it
+    # existed, which the unique index then ignores.
+    position = db.Column(db.Integer, nullable=True)
+    text = db.Column(db.Text, nullable=False)
+    __table_args__ = (db.Index('ux_history_passage_position', 'history_id', 'position', unique=True),)
+
+class UserCache:
+    # Bounded TTL/LRU map of user id -> column values for the login loader.
+    # Snapshots rather than instances, since an instance belongs to the
+    # session of the request that loaded it.
+    def __init__(self, max_entries=int(os.environ.get('USER_CACHE_SIZE', 10000)),
+                 ttl_seconds=int(os.environ.get('USER_CACHE_TTL', 300))):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] < time.monotonic():
+                self._entries.pop(user_id, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[1]
+    
+    def set(self, user_id, snapshot):
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, snapshot)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def delete(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+    
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+user_cache = UserCache()
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def invalidate_cached_user(mapper, connection, target):
+    user_cache.delete(target.id)
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    user_id = int(user_id)
+    snapshot = user_cache.get(user_id)
+    if snapshot is not None:
+        user = User(**snapshot)
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+    
+    user = db.session.get(User, user_id)
+    if user is not None:
+        user_cache.set(user_id, {column.key: getattr(user, column.key) for column in User.__table__.columns})
+    return user
+
+# Full-text search over history: an FTS5 table on SQLite, a tsvector table
+# with a GIN index on Postgres. Both are keyed by history.id and written in
+# the same transaction as each History insert.
+def setup_history_search():
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        db.session.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5("
+            "title, summary, key_points, user_id UNINDEXED, tokenize='porter unicode61')"
+        ))
+        db.session.execute(text(
+            "INSERT INTO history_fts (rowid, title, summary, key_points, user_id) "
+            "SELECT id, title, COALESCE(json_extract(summary, '$.summary'), ''), "
+            "COALESCE(json_extract(summary, '$.key_points'), ''), user_id FROM history "
+            "WHERE json_valid(summary) AND id NOT IN (SELECT rowid FROM history_fts)"
+        ))
+    elif dialect == 'postgresql':
+        db.session.execute(text(
+            "CREATE TABLE IF NOT EXISTS history_search ("
+            "history_id INTEGER PRIMARY KEY REFERENCES history(id) ON DELETE CASCADE, "
+            "user_id INTEGER NOT NULL, document TSVECTOR NOT NULL)"
+        ))
+        db.session.execute(text("CREATE INDEX IF NOT EXISTS ix_history_search_document ON history_search USING GIN (document)"))
+        db.session.execute(text("CREATE INDEX IF NOT EXISTS ix_history_search_user ON history_search (user_id)"))
+        # Workers booting together run this backfill at the same time.
+        db.session.execute(text(
+            "INSERT INTO history_search (history_id, user_id, document) "
+            "SELECT id, user_id, setweight(to_tsvector('english', title), 'A') || "
+            "setweight(to_tsvector('english', COALESCE(summary::json->>'summary', '')), 'B') || "
+            "setweight(to_tsvector('english', COALESCE(summary::json->>'key_points', '')), 'B') "
+            "FROM history WHERE summary IS NOT NULL "
+            "AND id NOT IN (SELECT history_id FROM history_search) "
+            "ON CONFLICT (history_id) DO NOTHING"
+        ))
+    db.session.commit()
+
+def index_history_search(history, summary_data):
+    summary_data = summary_data if isinstance(summary_data, dict) else {}
+    params = {
+        'id': history.id,
+        'user_id': history.user_id,
+        'title': history.title,
+        'summary': summary_data.get('summary', '') or '',
+        'key_points': ' '.join(str(p) for p in summary_data.get('key_points') or [])
+    }
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        db.session.execute(text(
+            "INSERT OR REPLACE INTO history_fts (rowid, title, summary, key_points, user_id) "
+            "VALUES (:id, :title, :summary, :key_points, :user_id)"
+        ), params)
+    elif dialect == 'postgresql':
+        db.session.execute(text(
+            "INSERT INTO history_search (history_id, user_id, document) VALUES (:id, :user_id, "
+            "setweight(to_tsvector('english', :title), 'A') || "
+            "setweight(to_tsvector('english', :summary), 'B') || "
+            "setweight(to_tsvector('english', :key_points), 'B')) "
+            "ON CONFLICT (history_id) DO UPDATE SET document = EXCLUDED.document"
+        ), params)
+
+def search_history_rows(user_id, query, limit, after=None):
+    # Results are ordered by (rank, id) ascending; `after` is the last
+    # (rank, id) pair of the previous page.
+    dialect = db.engine.dialect.name
+    params = {'user_id': user_id, 'limit': limit}
+    if dialect == 'sqlite':
+        terms = re.findall(r'\w+', query)
+        if not terms:
+            return []
+        params['q'] = ' '.join(f'"{t}"*' for t in terms)
+        ranked = (
+            "SELECT h.id, h.title, h.video_url, h.created_at, bm25(history_fts, 10.0, 2.0, 4.0) AS rank "
+            "FROM history_fts JOIN history h ON h.id = history_fts.rowid "
+            "WHERE history_fts MATCH :q AND history_fts.user_id = :user_id"
+        )
+    elif dialect == 'postgresql':
+        params['q'] = query
+        ranked = (
+            "SELECT h.id, h.title, h.video_url, h.created_at, "
+            "-ts_rank_cd(s.document, websearch_to_tsquery('english', :q)) AS rank "
+            "FROM history_search s JOIN history h ON h.id = s.history_id "
+            "WHERE s.user_id = :user_id AND s.document @@ websearch_to_tsquery('english', :q)"
+        )
+    else:
+        raise RuntimeError(f"History search is not supported on {dialect}")
+    
+    sql = f"SELECT * FROM ({ranked}) ranked"
+    if after is not None:
+        params['after_rank'], params['after_id'] = after
+        sql += " WHERE rank > :after_rank OR (rank = :after_rank AND id > :after_id)"
+    sql += " ORDER BY rank, id LIMIT :limit"
+    return db.session.execute(text(sql), params).mappings().all()
+
+def pack_payload(data, codec):
+    raw = json.dumps(data, separators=(',', ':')).encode('utf-8')
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=10).compress(raw)
+    return zlib.compress(raw, 9)
+
+def unpack_payload(blob, codec):
+    if codec == 'zstd':
+        raw = zstandard.ZstdDecompressor().decompress(blob)
+    else:
+        raw = zlib.decompress(blob)
+    return json.loads(raw.decode('utf-8'))
+
+def video_id_for(url):
+    match = re.search(r'(?:[?&]v=|youtu\.be/|/shorts/|/embed/|/live/)([A-Za-z0-9_-]{11})', url)
+    if match:
+        return f"yt:{match.group(1)}"
+    return f"url:{hashlib.sha1(url.strip().encode('utf-8')).hexdigest()}"
+
+def find_video_result(video_id):
+    return VideoResult.query.filter_by(video_id=video_id, generator_version=GENERATOR_VERSION).first()
+
+def save_video_result(video_id, title, duration, summary_data, quiz):
+    codec = 'zstd' if zstandard else 'zlib'
+    result = VideoResult(
+        video_id=video_id,
+        generator_version=GENERATOR_VERSION,
+        title=title,
+        duration=int(duration or 0),
+        codec=codec,
+        summary_blob=pack_payload(summary_data, codec),
+        quiz_blob=pack_payload(quiz, codec)
+    )
+    db.session.add(result)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another request stored the same video first; share its row.
+        db.session.rollback()
+        result = find_video_result(video_id)
+    return result
+
+def history_payload(history):
+    if history.result_id:
+        result = db.session.get(VideoResult, history.result_id)
+        return unpack_payload(result.summary_blob, result.codec), unpack_payload(result.quiz_blob, result.codec)
+    summary_data = json.loads(history.summary) if history.summary else None
+    quiz = json.loads(history.quiz_data) if history.quiz_data else None
+    return summary_data, quiz
 
 with app.app_context():
     db.create_all()
+    if 'result_id' not in {column['name'] for column in inspect(db.engine).get_columns('history')}:
+        db.session.execute(text("ALTER TABLE history ADD COLUMN result_id INTEGER REFERENCES video_result(id)"))
+        db.session.commit()
+    if 'position' not in {column['name'] for column in inspect(db.engine).get_columns('history_passage')}:
+        db.session.execute(text("ALTER TABLE history_passage ADD COLUMN position INTEGER"))
+        db.session.commit()
+    # create_all skips indexes on tables that already exist.
+    for table_index in list(History.__table__.indexes) + list(HistoryPassage.__table__.indexes):
+        table_index.create(db.engine, checkfirst=True)
+    setup_history_search()
 
 @app.route('/')
 def index():
@@ -193,7 +458,7 @@ def extract_video_info(url):
         logger.error(f"Error extracting video info: {str(e)}")
         raise Exception(f"Could not process video: {str(e)}")
 
-def generate_summary_with_ai(content, title):
+def generate_summary_with_ai(content, title, fallback=True):
     if not openai_client:
         return generate_simple_summary(content, title)
     
@@ -224,6 +489,8 @@ Format your response as JSON with keys: summary, key_points (array), topics (arr
         return result
     except Exception as e:
         logger.error(f"AI summary error: {str(e)}")
+        if not fallback:
+            raise
         return generate_simple_summary(content, title)
 
 def generate_simple_summary(content, title):
@@ -237,7 +504,7 @@ def generate_simple_summary(content, title):
         'concepts': ["Main topic from the video"]
     }
 
-def generate_quiz_with_ai(content, title, num_questions=5):
+def generate_quiz_with_ai(content, title, num_questions=5, fallback=True):
     if not openai_client:
         return generate_simple_quiz(title, num_questions)
     
@@ -268,9 +535,11 @@ Format as JSON array with objects containing:
         elif isinstance(result, list):
             return result
         else:
-            return generate_simple_quiz(title, num_questions)
+            raise ValueError("AI quiz response has no questions")
     except Exception as e:
         logger.error(f"AI quiz error: {str(e)}")
+        if not fallback:
+            raise
         return generate_simple_quiz(title, num_questions)
 
 def generate_simple_quiz(title, num_questions=5):
@@ -284,6 +553,284 @@ def generate_simple_quiz(title, num_questions=5):
         })
     return questions
 
+def run_ai_tasks(tasks, timeout=AI_TASK_TIMEOUT):
+    futures = {name: AI_EXECUTOR.submit(fn) for name, (fn, fallback) in tasks.items()}
+    wait(futures.values(), timeout=timeout)
+    
+    results = {}
+    fallbacks = set()
+    for name, future in futures.items():
+        fallback = tasks[name][1]
+        if not future.done():
+            future.cancel()
+            logger.warning(f"AI task '{name}' exceeded {timeout}s, using fallback")
+            results[name] = fallback()
+            fallbacks.add(name)
+            continue
+        try:
+            results[name] = future.result()
+        except Exception as e:
+            logger.error(f"AI task '{name}' failed: {str(e)}")
+            results[name] = fallback()
+            fallbacks.add(name)
+    return results, fallbacks
+
+SEARCH_TOKEN_RE = re.compile(r"[a-z0-9]+")
+SEARCH_STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from has have how i in is it its of on or so that the "
+    "their this to was were what when where which who why will with you your about into than then there".split()
+)
+
+def search_tokens(text):
+    return [t for t in SEARCH_TOKEN_RE.findall(text.lower()) if t not in SEARCH_STOPWORDS and len(t) > 1]
+
+def history_passages(title, summary_data, quiz, max_chars=600):
+    summary_data = summary_data if isinstance(summary_data, dict) else {'summary': str(summary_data or '')}
+    passages = []
+    chunk = ''
+    for sentence in re.split(r'(?<=[.!?])\s+', summary_data.get('summary', '') or ''):
+        if chunk and len(chunk) + len(sentence) > max_chars:
+            passages.append(f"{title}: {chunk}")
+            chunk = ''
+        chunk = f"{chunk} {sentence}".strip()
+    passages.append(f"{title}: {chunk}" if chunk else title)
+    
+    for key in ('key_points', 'topics', 'concepts'):
+        items = [str(item) for item in summary_data.get(key) or []]
+        if items:
+            passages.append(f"{title} - {key.replace('_', ' ')}: " + '; '.join(items))
+    
+    for q in quiz or []:
+        if isinstance(q, dict) and q.get('question'):
+            passages.append(f"{title} - quiz: {q['question']} {q.get('explanation', '')}".strip())
+    return passages
+
+class LibraryIndex:
+    # Per-user BM25 over HistoryPassage rows. Each cached index remembers the
+    # highest passage id it holds, and every search first adds the user's
+    # rows past it, so passages written by any process show up on the next
+    # query. After LIBRARY_INDEX_TTL seconds an index is rebuilt from
+    # scratch, which also drops deleted rows and picks up ids that committed
+    # out of order.
+    def __init__(self, max_users=int(os.environ.get('LIBRARY_INDEX_USERS', 256)),
+                 ttl_seconds=int(os.environ.get('LIBRARY_INDEX_TTL', 600)), k1=1.5, b=0.75):
+        self.max_users = max_users
+        self.ttl = ttl_seconds
+        self.k1 = k1
+        self.b = b
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def _empty(self):
+        return {'passages': [], 'postings': defaultdict(list), 'lengths': [], 'total_length': 0,
+                'last_id': 0, 'expires_at': time.monotonic() + self.ttl}
+    
+    def _add(self, index, history_id, title, text):
+        counts = Counter(search_tokens(text))
+        position = len(index['passages'])
+        index['passages'].append((history_id, title, text))
+        index['lengths'].append(sum(counts.values()))
+        index['total_length'] += index['lengths'][-1]
+        for term, tf in counts.items():
+            index['postings'][term].append((position, tf))
+    
+    def _get(self, user_id):
+        with self._lock:
+            index = self._users.get(user_id)
+            if index is not None and index['expires_at'] <= time.monotonic():
+                index = None
+            last_id = index['last_id'] if index is not None else 0
+        built = index is None
+        if built:
+            backfill_missing_passages(user_id)
+            index = self._empty()
+        
+        rows = db.session.query(HistoryPassage.id, HistoryPassage.history_id, History.title, HistoryPassage.text)\
+            .join(History, History.id == HistoryPassage.history_id)\
+            .filter(HistoryPassage.user_id == user_id, HistoryPassage.id > last_id)\
+            .order_by(HistoryPassage.id).all()
+        with self._lock:
+            # Another search may have caught the same index up meanwhile.
+            for passage_id, history_id, title, text in rows:
+                if passage_id > index['last_id']:
+                    self._add(index, history_id, title, text)
+                    index['last_id'] = passage_id
+            if built:
+                self._users[user_id] = index
+            if user_id in self._users:
+                self._users.move_to_end(user_id)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        return index
+    
+    def search(self, user_id, query, top_k=5):
+        index = self._get(user_id)
+        with self._lock:
+            total = len(index['passages'])
+            if not total:
+                return []
+            avg_length = index['total_length'] / total or 1
+            scores = defaultdict(float)
+            for term in set(search_tokens(query)):
+                postings = index['postings'].get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+                for position, tf in postings:
+                    norm = self.k1 * (1 - self.b + self.b * index['lengths'][position] / avg_length)
+                    scores[position] += idf * tf * (self.k1 + 1) / (tf + norm)
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+            return [{
+                'history_id': index['passages'][position][0],
+                'title': index['passages'][position][1],
+                'text': index['passages'][position][2],
+                'score': round(score, 3)
+            } for position, score in ranked]
+
+library_index = LibraryIndex()
+
+def index_history(history, summary_data, quiz):
+    # Adds the passages to the caller's transaction; committing them with the
+    # History row means no reader ever sees the row without them.
+    insert_passages(history, history_passages(history.title, summary_data, quiz))
+
+def insert_passages(history, passages):
+    # Insert-if-absent on (history_id, position), so a backfill racing
+    # another process's backfill cannot store a History row's passages twice.
+    rows = [{'user_id': history.user_id, 'history_id': history.id, 'position': position, 'text': text}
+            for position, text in enumerate(passages)]
+    if not rows:
+        return
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        statement = postgresql.insert(HistoryPassage).on_conflict_do_nothing(index_elements=['history_id', 'position'])
+    elif dialect == 'sqlite':
+        statement = sqlite.insert(HistoryPassage).on_conflict_do_nothing(index_elements=['history_id', 'position'])
+    else:
+        statement = HistoryPassage.__table__.insert()
+    db.session.execute(statement, rows)
+
+# Striped per-user locks: concurrent first searches by one user in this
+# process backfill once; the unique index covers other processes.
+_backfill_locks = [threading.Lock() for _ in range(64)]
+
+def backfill_missing_passages(user_id):
+    with _backfill_locks[hash(user_id) % len(_backfill_locks)]:
+        indexed = db.session.query(HistoryPassage.history_id).filter(HistoryPassage.user_id == user_id)
+        missing = History.query.options(undefer(History.summary), undefer(History.quiz_data))\
+            .filter(History.user_id == user_id, ~History.id.in_(indexed)).all()
+        for history in missing:
+            summary_data, quiz = history_payload(history)
+            insert_passages(history, history_passages(history.title, summary_data, quiz))
+        if missing:
+            db.session.commit()
+
+class WriteBehindQueue:
+    # History and ChatHistory inserts are queued by request handlers and
+    # written in batches by one background thread per process. The thread is
+    # started on first use so it is created after gunicorn forks. on_flush
+    # runs once the row has its id, inside the same transaction, for rows
+    # that must be saved together with it.
+    def __init__(self, max_pending=int(os.environ.get('WRITE_QUEUE_MAX_PENDING', 1000)),
+                 batch_size=int(os.environ.get('WRITE_QUEUE_BATCH_SIZE', 100)),
+                 flush_interval=float(os.environ.get('WRITE_QUEUE_FLUSH_INTERVAL', 0.5))):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._stopping = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._counters = {'enqueued': 0, 'written': 0, 'batches': 0, 'split': 0, 'failed': 0, 'overflow': 0}
+    
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+    
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+                self._thread.start()
+    
+    def submit(self, model, values, on_flush=None):
+        if self._stopping.is_set():
+            self._write([(model, values, on_flush)])
+            return
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((model, values, on_flush))
+            self._count('enqueued')
+        except queue.Full:
+            # Back-pressure: the caller pays for its own write instead of
+            # growing the queue without bound.
+            self._count('overflow')
+            self._write([(model, values, on_flush)])
+    
+    def _drain(self):
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+    
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            batch = self._drain()
+            if batch:
+                with app.app_context():
+                    self._write(batch)
+    
+    def _write(self, batch):
+        try:
+            self._insert(batch)
+        except Exception as e:
+            db.session.rollback()
+            if len(batch) == 1:
+                self._count('failed')
+                logger.error(f"Write-behind insert failed, row dropped: {str(e)}")
+                return
+            # One bad row (a foreign key violation, say) must not cost everyone
+            # else's history: retry each row in its own transaction.
+            self._count('split')
+            logger.warning(f"Write-behind batch of {len(batch)} rows failed, retrying row by row: {str(e)}")
+            for item in batch:
+                try:
+                    self._insert([item])
+                except Exception as e:
+                    db.session.rollback()
+                    self._count('failed')
+                    logger.error(f"Write-behind insert into {item[0].__tablename__} failed, row dropped: {str(e)}")
+    
+    def _insert(self, batch):
+        rows = [(model(**values), on_flush) for model, values, on_flush in batch]
+        db.session.add_all([row for row, _ in rows])
+        db.session.flush()
+        for row, on_flush in rows:
+            if on_flush:
+                on_flush(row)
+        db.session.commit()
+        self._count('written', len(rows))
+        self._count('batches')
+    
+    def close(self, timeout=10):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+    
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, pending=self._queue.qsize())
+
+write_queue = WriteBehindQueue()
+atexit.register(write_queue.close)
+
 @app.route('/api/process_video', methods=['POST'])
 def process_video():
     try:
@@ -293,30 +840,54 @@ def process_video():
         if not video_url:
             return jsonify({'success': False, 'error': 'Please provide a video URL'}), 400
         
-        video_info = extract_video_info(video_url)
+        video_id = video_id_for(video_url)
+        stored = find_video_result(video_id) if openai_client else None
         
-        content = video_info['content'] or video_info['title']
-        summary_data = generate_summary_with_ai(content, video_info['title'])
-        
-        quiz = generate_quiz_with_ai(content, video_info['title'], 5)
+        if stored:
+            title, duration = stored.title, stored.duration
+            summary_data = unpack_payload(stored.summary_blob, stored.codec)
+            quiz = unpack_payload(stored.quiz_blob, stored.codec)
+        else:
+            video_info = extract_video_info(video_url)
+            
+            content = video_info['content'] or video_info['title']
+            title, duration = video_info['title'], video_info['duration']
+            results, fallbacks = run_ai_tasks({
+                'summary': (lambda: generate_summary_with_ai(content, title, fallback=False), lambda: generate_simple_summary(content, title)),
+                'quiz': (lambda: generate_quiz_with_ai(content, title, 5, fallback=False), lambda: generate_simple_quiz(title, 5)),
+            })
+            summary_data = results['summary']
+            quiz = results['quiz']
+            if openai_client and not fallbacks:
+                stored = save_video_result(video_id, title, duration, summary_data, quiz)
         
+        history_entry = None
         if current_user.is_authenticated:
-            history = History(
-                user_id=current_user.id,
-                title=video_info['title'],
-                video_url=video_url,
-                summary=json.dumps(summary_data),
-                quiz_data=json.dumps(quiz)
-            )
-            db.session.add(history)
-            db.session.commit()
+            def index_new_history(history):
+                index_history(history, summary_data, quiz)
+                index_history_search(history, summary_data)
+            
+            created_at = datetime.utcnow()
+            write_queue.submit(History, {
+                'user_id': current_user.id,
+                'title': title,
+                'video_url': video_url,
+                'summary': None if stored else json.dumps(summary_data),
+                'quiz_data': None if stored else json.dumps(quiz),
+                'result_id': stored.id if stored else None,
+                'created_at': created_at
+            }, on_flush=index_new_history)
+            # The row is written after this returns, so its id is not known
+            # yet; the page adds this entry to the sidebar itself.
+            history_entry = {'id': None, 'title': title, 'video_url': video_url, 'created_at': created_at.isoformat()}
         
         return jsonify({
             'success': True,
-            'title': video_info['title'],
-            'duration': video_info['duration'],
+            'title': title,
+            'duration': duration,
             'summary': summary_data,
-            'quiz': quiz
+            'quiz': quiz,
+            'history': history_entry
         })
     except Exception as e:
         logger.error(f"Video processing error: {str(e)}")
@@ -334,10 +905,21 @@ def chat():
         if not openai_client:
             return jsonify({'success': False, 'error': 'AI chat requires OpenAI API key'}), 400
         
+        system_prompt = "You are a helpful AI assistant. Be friendly, informative, and helpful. Answer questions clearly and concisely."
+        sources = []
+        if current_user.is_authenticated:
+            sources = library_index.search(current_user.id, message, top_k=5)
+            if sources:
+                excerpts = '\n'.join(f"[history:{s['history_id']}] {s['text']}" for s in sources)
+                system_prompt += (
+                    "\n\nPassages from the user's saved video library that may be relevant:\n"
+                    f"{excerpts}\n\nWhen you use a passage, cite it as [history:<id>]."
+                )
+        
         response = openai_client.chat.completions.create(
             model="gpt-5",
             messages=[
-                {"role": "system", "content": "You are a helpful AI assistant. Be friendly, informative, and helpful. Answer questions clearly and concisely."},
+                {"role": "system", "content": system_prompt},
                 {"role": "user", "content": message}
             ],
             max_completion_tokens=1024
@@ -346,15 +928,18 @@ def chat():
         ai_response = response.choices[0].message.content
         
         if current_user.is_authenticated:
-            chat_entry = ChatHistory(
-                user_id=current_user.id,
-                message=message,
-                response=ai_response
-            )
-            db.session.add(chat_entry)
-            db.session.commit()
+            write_queue.submit(ChatHistory, {
+                'user_id': current_user.id,
+                'message': message,
+                'response': ai_response,
+                'created_at': datetime.utcnow()
+            })
         
-        return jsonify({'success': True, 'response': ai_response})
+        return jsonify({
+            'success': True,
+            'response': ai_response,
+            'sources': [{'history_id': s['history_id'], 'title': s['title']} for s in sources]
+        })
     except Exception as e:
         logger.error(f"Chat error: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -364,7 +949,25 @@ def get_history():
     if not current_user.is_authenticated:
         return jsonify({'success': False, 'error': 'Please login to view history'}), 401
     
-    histories = History.query.filter_by(user_id=current_user.id).order_by(History.created_at.desc()).limit(50).all()
+    limit = max(1, min(request.args.get('limit', 50, type=int), 100))
+    query = History.query.filter_by(user_id=current_user.id)
+    
+    before = request.args.get('before')
+    if before:
+        try:
+            created_at, last_id = before.rsplit(',', 1)
+            created_at, last_id = datetime.fromisoformat(created_at), int(last_id)
+        except ValueError:
+            return jsonify({'success': False, 'error': 'Invalid cursor'}), 400
+        query = query.filter(or_(
+            History.created_at < created_at,
+            and_(History.created_at == created_at, History.id < last_id)
+        ))
+    
+    histories = query.order_by(History.created_at.desc(), History.id.desc()).limit(limit).all()
+    next_before = None
+    if len(histories) == limit:
+        next_before = f"{histories[-1].created_at.isoformat()},{histories[-1].id}"
     
     return jsonify({
         'success': True,
@@ -373,26 +976,92 @@ def get_history():
             'title': h.title,
             'video_url': h.video_url,
             'created_at': h.created_at.isoformat()
-        } for h in histories]
+        } for h in histories],
+        'next_before': next_before
+    })
+
+@app.route('/api/write_queue/stats', methods=['GET'])
+def write_queue_stats():
+    if not current_user.is_authenticated:
+        return jsonify({'success': False, 'error': 'Please login'}), 401
+    return jsonify({'success': True, 'stats': write_queue.stats()})
+
+@app.route('/api/user_cache/stats', methods=['GET'])
+def user_cache_stats():
+    if not current_user.is_authenticated:
+        return jsonify({'success': False, 'error': 'Please login'}), 401
+    return jsonify({'success': True, 'stats': user_cache.stats()})
+
+@app.route('/api/history/search', methods=['GET'])
+def search_history():
+    if not current_user.is_authenticated:
+        return jsonify({'success': False, 'error': 'Please login to search history'}), 401
+    
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'success': False, 'error': 'Please provide a search query'}), 400
+    
+    limit = max(1, min(request.args.get('limit', 20, type=int), 50))
+    after = None
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            rank, last_id = cursor.split(',', 1)
+            after = (float(rank), int(last_id))
+        except ValueError:
+            return jsonify({'success': False, 'error': 'Invalid cursor'}), 400
+    
+    try:
+        rows = search_history_rows(current_user.id, query, limit, after)
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"History search error: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+    
+    next_cursor = f"{rows[-1]['rank']!r},{rows[-1]['id']}" if len(rows) == limit else None
+    return jsonify({
+        'success': True,
+        'results': [{
+            'id': row['id'],
+            'title': row['title'],
+            'video_url': row['video_url'],
+            'created_at': row['created_at'].isoformat() if hasattr(row['created_at'], 'isoformat') else row['created_at'],
+            'score': round(-row['rank'], 4)
+        } for row in rows],
+        'next_cursor': next_cursor
     })
 
+@app.route('/api/library/search', methods=['GET'])
+def search_library():
+    if not current_user.is_authenticated:
+        return jsonify({'success': False, 'error': 'Please login to search your library'}), 401
+    
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'success': False, 'error': 'Please provide a search query'}), 400
+    
+    limit = max(1, min(request.args.get('limit', 10, type=int), 50))
+    return jsonify({'success': True, 'results': library_index.search(current_user.id, query, top_k=limit)})
+
 @app.route('/api/history/<int:history_id>', methods=['GET'])
 def get_history_item(history_id):
     if not current_user.is_authenticated:
         return jsonify({'success': False, 'error': 'Please login'}), 401
     
-    history = History.query.filter_by(id=history_id, user_id=current_user.id).first()
+    history = History.query.options(undefer(History.summary), undefer(History.quiz_data))\
+        .filter_by(id=history_id, user_id=current_user.id).first()
     if not history:
         return jsonify({'success': False, 'error': 'Not found'}), 404
     
+    summary_data, quiz = history_payload(history)
     return jsonify({
         'success': True,
         'item': {
             'id': history.id,
             'title': history.title,
             'video_url': history.video_url,
-            'summary': json.loads(history.summary) if history.summary else None,
-            'quiz': json.loads(history.quiz_data) if history.quiz_data else None,
+            'summary': summary_data,
+            'quiz': quiz,
             'created_at': history.created_at.isoformat()
         }
     })
@@ -206,7 +206,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 displayResults(data);
                 resultsSection.classList.add('active');
                 showToast('Video analyzed successfully!');
-                if (currentUser) loadHistory();
+                if (currentUser && data.history) addPendingHistory(data.history, data);
             } else {
                 showToast(data.error || 'Failed to analyze video', 'error');
             }
@@ -468,6 +468,27 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
 
+    function addPendingHistory(entry, result) {
+        // History rows are saved in the background; show the new one from
+        // the response until the next full reload lists it with its id.
+        const empty = historyList.querySelector('.history-empty');
+        if (empty) empty.remove();
+
+        const item = document.createElement('div');
+        item.className = 'history-item';
+        const heading = document.createElement('h4');
+        heading.textContent = entry.title;
+        const date = document.createElement('span');
+        date.textContent = new Date(entry.created_at).toLocaleDateString();
+        item.append(heading, date);
+        item.addEventListener('click', () => {
+            currentResult = { title: result.title, summary: result.summary, quiz: result.quiz };
+            displayResults(currentResult);
+            resultsSection.classList.add('active');
+        });
+        historyList.prepend(item);
+    }
+
     async function loadHistoryItem(id) {
         try {
             const response = await fetch(`/api/history/${id}`);
@@ -2,7 +2,7 @@ from datetime import datetime
 from app import db
 from flask_dance.consumer.storage.sqla import OAuthConsumerMixin
 from flask_login import UserMixin
-from sqlalchemy import UniqueConstraint
+from sqlalchemy import UniqueConstraint, Index
 
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
@@ -24,3 +24,30 @@ class OAuth(OAuthConsumerMixin, db.Model):
         'provider',
         name='uq_user_browser_session_key_provider',
     ),)
+
+class VideoCache(db.Model):
+    __tablename__ = 'video_cache'
+    video_id = db.Column(db.String, primary_key=True)
+    payload = db.Column(db.Text, nullable=False)
+    size_bytes = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.now, index=True)
+    last_accessed = db.Column(db.DateTime, default=datetime.now, index=True)
+
+class Job(db.Model):
+    __tablename__ = 'jobs'
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.String, db.ForeignKey(User.id), nullable=True, index=True)
+    video_url = db.Column(db.String, nullable=False)
+    lane = db.Column(db.String(16), nullable=False, default='interactive')
+    priority = db.Column(db.Integer, nullable=False, default=0)
+    status = db.Column(db.String(16), nullable=False, default='queued')
+    stage = db.Column(db.String(32), nullable=True)
+    result = db.Column(db.Text, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    worker_id = db.Column(db.String, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    started_at = db.Column(db.DateTime, nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    __table_args__ = (Index('ix_jobs_claim', 'status', 'priority', 'created_at'),)
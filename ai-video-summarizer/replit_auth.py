@@ -1,10 +1,12 @@
 import jwt
 import os
+import time
 import uuid
+import importlib
 from functools import wraps
 from urllib.parse import urlencode
 
-from flask import g, session, redirect, request, render_template, url_for
+from flask import g, session, redirect, request, render_template, url_for, jsonify
 from flask_dance.consumer import (
     OAuth2ConsumerBlueprint,
     oauth_authorized,
@@ -14,30 +16,101 @@ from flask_dance.consumer.storage import BaseStorage
 from flask_login import LoginManager, login_user, logout_user, current_user
 from oauthlib.oauth2.rfc6749.errors import InvalidGrantError
 from sqlalchemy.exc import NoResultFound
+from sqlalchemy.orm import make_transient_to_detached
 from werkzeug.local import LocalProxy
 
 from app import app, db
 from models import OAuth, User
+from services.ttl_cache import TTLCache
 
 login_manager = LoginManager(app)
 
+# Column snapshots rather than ORM instances: a cached instance would be
+# bound to (and expired by) the session of the request that loaded it.
+user_cache = TTLCache(
+    max_entries=int(os.environ.get('USER_CACHE_SIZE', 10000)),
+    ttl_seconds=int(os.environ.get('USER_CACHE_TTL', 300))
+)
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(user_id)
+    snapshot = user_cache.get(user_id)
+    if snapshot is not None:
+        user = User(**snapshot)
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+    
+    user = db.session.get(User, user_id)
+    if user is not None:
+        user_cache.set(user_id, {column.key: getattr(user, column.key) for column in User.__table__.columns})
+    return user
+
+# Tokens keyed by (user_id, browser_session_key, provider). _NO_TOKEN marks
+# a cached miss so anonymous requests skip the query as well.
+_NO_TOKEN = object()
+token_cache = TTLCache(
+    max_entries=int(os.environ.get('OAUTH_TOKEN_CACHE_SIZE', 10000)),
+    ttl_seconds=int(os.environ.get('OAUTH_TOKEN_CACHE_TTL', 300))
+)
+
+def _load_invalidation_hook():
+    # Other workers keep their own token_cache. A hook configured as
+    # "package.module:function" is called with the key after every set and
+    # delete; it should fan out (Redis pub/sub, Postgres NOTIFY, ...) to a
+    # listener in each worker that calls invalidate_token(*key).
+    target = os.environ.get('OAUTH_TOKEN_INVALIDATION_HOOK')
+    if not target:
+        return None
+    module_name, _, function_name = target.partition(':')
+    return getattr(importlib.import_module(module_name), function_name)
+
+token_invalidation_hook = _load_invalidation_hook()
+
+def invalidate_token(user_id, browser_session_key, provider):
+    token_cache.delete((user_id, browser_session_key, provider))
 
 class UserSessionStorage(BaseStorage):
+    def _key(self, blueprint):
+        return (current_user.get_id(), g.browser_session_key, blueprint.name)
+
+    def _invalidate(self, key):
+        token_cache.delete(key)
+        if token_invalidation_hook:
+            token_invalidation_hook(key)
+
     def get(self, blueprint):
+        key = self._key(blueprint)
+        token = token_cache.get(key)
+        if token is _NO_TOKEN:
+            return None
+        if token is not None:
+            expires_at = token.get('expires_at')
+            if expires_at is None or expires_at > time.time():
+                return token
+            token_cache.delete(key)
+
         try:
             token = db.session.query(OAuth).filter_by(
-                user_id=current_user.get_id(),
-                browser_session_key=g.browser_session_key,
-                provider=blueprint.name,
+                user_id=key[0],
+                browser_session_key=key[1],
+                provider=key[2],
             ).one().token
         except NoResultFound:
             token = None
+
+        if token is None:
+            token_cache.set(key, _NO_TOKEN)
+        else:
+            # An expired token is still returned (flask-dance refreshes it
+            # and calls set), but it is never served from the cache.
+            expires_at = token.get('expires_at')
+            ttl = token_cache.ttl if expires_at is None else min(token_cache.ttl, expires_at - time.time())
+            if ttl > 0:
+                token_cache.set(key, token, ttl_seconds=ttl)
         return token
 
     def set(self, blueprint, token):
+        key = self._key(blueprint)
         db.session.query(OAuth).filter_by(
             user_id=current_user.get_id(),
             browser_session_key=g.browser_session_key,
@@ -50,13 +123,16 @@ class UserSessionStorage(BaseStorage):
         new_model.token = token
         db.session.add(new_model)
         db.session.commit()
+        self._invalidate(key)
 
     def delete(self, blueprint):
+        key = self._key(blueprint)
         db.session.query(OAuth).filter_by(
             user_id=current_user.get_id(),
             browser_session_key=g.browser_session_key,
             provider=blueprint.name).delete()
         db.session.commit()
+        self._invalidate(key)
 
 def make_replit_blueprint():
     try:
@@ -119,6 +195,7 @@ def save_user(user_claims):
     user.profile_image_url = user_claims.get('profile_image_url')
     merged_user = db.session.merge(user)
     db.session.commit()
+    user_cache.delete(merged_user.id)
     return merged_user
 
 @oauth_authorized.connect
@@ -144,6 +221,20 @@ def require_login(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def is_admin(user):
+    admin_ids = [uid.strip() for uid in os.environ.get('ADMIN_USER_IDS', '').split(',') if uid.strip()]
+    return user.is_authenticated and user.get_id() in admin_ids
+
+def require_admin(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not current_user.is_authenticated:
+            return jsonify({'error': 'Login required'}), 401
+        if not is_admin(current_user):
+            return jsonify({'error': 'Admin access required'}), 403
+        return f(*args, **kwargs)
+    return decorated_function
+
 def get_next_navigation_url(request):
     is_navigation_url = request.headers.get('Sec-Fetch-Mode') == 'navigate' and request.headers.get('Sec-Fetch-Dest') == 'document'
     if is_navigation_url:
@@ -1,15 +1,30 @@
-from flask import session, request, jsonify, render_template, send_file
+from flask import g, session, request, jsonify, render_template, send_file, make_response, Response, stream_with_context
 from app import app, db
-from replit_auth import require_login, make_replit_blueprint
+from replit_auth import require_login, require_admin, is_admin, make_replit_blueprint, user_cache, token_cache
 from flask_login import current_user
-from services.video_processor import VideoProcessor
+from services.video_processor import VideoProcessor, canonical_video_id
 from services.summary_generator import SummaryGenerator
 from services.quiz_generator import QuizGenerator
 from services.chatbot import LordNilChatbot
 from services.pdf_generator import PDFGenerator
+from services.result_cache import ResultCache
+from services.pipeline import VideoPipeline
+from services.job_queue import JobQueue
+from services.transcript_store import create_transcript_store
+from services.circuit_breaker import breaker_stats
+from services.deadline import Deadline, DeadlineExceeded
+from services.admission import AdmissionController, Rejected, admission_stats
+from services.metrics import (registry, register_caches, stage, start_request_timings, bound_timings,
+                              server_timing_header, timings_ms, HTTP_REQUEST_SECONDS)
 import logging
+import json
 import io
 import os
+import hmac
+import time
+import pstats
+import cProfile
+from functools import wraps
 
 app.register_blueprint(make_replit_blueprint(), url_prefix="/auth")
 
@@ -18,6 +33,19 @@ summary_generator = SummaryGenerator()
 quiz_generator = QuizGenerator()
 chatbot = LordNilChatbot()
 pdf_generator = PDFGenerator()
+result_cache = ResultCache()
+video_pipeline = VideoPipeline(video_processor, summary_generator, quiz_generator, result_cache)
+job_queue = JobQueue()
+transcript_store = create_transcript_store()
+process_video_admission = AdmissionController('process_video', max_in_flight=8, per_user=2, queue_size=16, queue_timeout=20)
+generate_quiz_admission = AdmissionController('generate_quiz', max_in_flight=8, per_user=2, queue_size=16, queue_timeout=10)
+register_caches({
+    'result': result_cache,
+    'video_metadata': video_processor.extractor_pool.metadata_cache,
+    'retrieval_index': chatbot.retriever.indexes,
+    'user': user_cache,
+    'oauth_token': token_cache,
+})
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -26,6 +54,52 @@ logger = logging.getLogger(__name__)
 def make_session_permanent():
     session.permanent = True
 
+@app.before_request
+def start_deadline():
+    # Started before any handler work so queueing and auth count against it.
+    g.deadline = Deadline.for_request()
+    g.request_started = time.perf_counter()
+    g.timings = start_request_timings()
+
+@app.before_request
+def start_profiler():
+    # Admin-only: ?profile=1 on an API call returns the top cumulative
+    # functions instead of the normal body. cProfile sees the request
+    # thread only; work on pools shows up as time waiting on futures.
+    if request.args.get('profile') == '1' and request.path.startswith('/api/') and is_admin(current_user):
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+def admission_controlled(controller):
+    # Holds a slot for the whole request; for a streamed response, until the
+    # stream has been sent or the client has gone away.
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            user_id = current_user.get_id()
+            try:
+                controller.acquire(user_id, g.deadline.timeout(controller.queue_timeout))
+            except Rejected as e:
+                response = jsonify({'error': e.reason})
+                response.status_code = e.status
+                response.headers['Retry-After'] = str(e.retry_after)
+                return response
+            
+            started = time.monotonic()
+            release = lambda: controller.release(user_id, time.monotonic() - started)
+            try:
+                response = make_response(f(*args, **kwargs))
+            except BaseException:
+                release()
+                raise
+            if response.is_streamed:
+                response.call_on_close(release)
+            else:
+                release()
+            return response
+        return decorated_function
+    return decorator
+
 @app.route('/')
 def index():
     user = current_user
@@ -40,6 +114,7 @@ def main_app():
 
 @app.route('/api/process_video', methods=['POST'])
 @require_login
+@admission_controlled(process_video_admission)
 def process_video():
     try:
         data = request.json
@@ -48,39 +123,136 @@ def process_video():
         if not video_url:
             return jsonify({'error': 'No video URL provided'}), 400
         
-        video_data = video_processor.process_url(video_url)
-        
-        summary = summary_generator.generate(video_data['transcript'])
-        
-        content_length = len(video_data['transcript'])
-        num_questions = 15 if content_length > 3000 else 10
-        quiz = quiz_generator.generate(video_data['transcript'], num_questions=num_questions, difficulty='medium')
-        
-        session['video_data'] = {
-            'title': video_data.get('title', 'Untitled'),
-            'transcript': video_data['transcript'][:2000]
-        }
-        
-        return jsonify({
-            'success': True,
-            'summary': summary,
-            'quiz': quiz,
-            'metadata': {
-                'duration': video_data.get('duration', 0),
-                'title': video_data.get('title', 'Untitled'),
-                'channel': video_data.get('channel', 'Unknown'),
-                'language': video_data.get('language', 'en'),
-                'thumbnail': video_data.get('thumbnail', ''),
-                'view_count': video_data.get('view_count', 0)
-            }
-        })
+        result, cached = video_pipeline.run(video_url, deadline=g.deadline)
+        
+        remember_video(video_url, result)
+        
+        with stage('serialize'):
+            return jsonify({
+                'success': True,
+                'cached': cached,
+                'summary': result['summary'],
+                'quiz': result['quiz'],
+                'sources': result.get('sources', {}),
+                'metadata': result['metadata']
+            })
+        
+    except DeadlineExceeded as e:
+        logger.warning(f"Gave up processing video: {str(e)}")
+        return jsonify({'error': str(e)}), 504
+    except Exception as e:
+        logger.error(f"Error processing video: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/process_video/stream', methods=['GET'])
+@require_login
+@admission_controlled(process_video_admission)
+def process_video_stream():
+    try:
+        video_url = request.args.get('url')
+        
+        if not video_url:
+            return jsonify({'error': 'No video URL provided'}), 400
         
+        result, cached = video_pipeline.prepare(video_url, deadline=g.deadline)
+        
+        remember_video(video_url, result)
+        
+    except DeadlineExceeded as e:
+        logger.warning(f"Gave up processing video: {str(e)}")
+        return jsonify({'error': str(e)}), 504
     except Exception as e:
         logger.error(f"Error processing video: {str(e)}")
         return jsonify({'error': str(e)}), 500
+    
+    # The Server-Timing header goes out before generation starts, so the
+    # done event carries the request's final timings instead.
+    timings = g.timings
+    started = g.request_started
+    
+    def final_timings():
+        return timings_ms(dict(timings, total=time.perf_counter() - started))
+    
+    def events():
+        try:
+            if cached:
+                yield sse_event('done', {
+                    'success': True,
+                    'cached': True,
+                    'summary': result['summary'],
+                    'quiz': result['quiz'],
+                    'sources': result.get('sources', {}),
+                    'metadata': result['metadata'],
+                    'server_timing': final_timings()
+                })
+                return
+            with bound_timings(timings):
+                for event, data in video_pipeline.stream_events(result, deadline=g.deadline):
+                    if event == 'done':
+                        data = dict(data, server_timing=final_timings())
+                    yield sse_event(event, data)
+        except Exception as e:
+            logger.error(f"Error streaming video: {str(e)}")
+            yield sse_event('error', {'error': str(e)})
+    
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'X-Accel-Buffering': 'no'})
+
+def remember_video(video_url, result):
+    video_id = result.get('video_id') or canonical_video_id(video_url)
+    title = result.get('metadata', {}).get('title', 'Untitled')
+    with stage('transcript_store', timing_name='db'):
+        transcript_store.put(current_user.get_id(), video_id, {
+            'title': title,
+            'transcript': result.get('transcript', ''),
+            'segments': result.get('segments')
+        })
+    session['video_data'] = {'title': title, 'video_id': video_id}
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/api/jobs', methods=['POST'])
+@require_login
+def submit_job():
+    try:
+        data = request.json or {}
+        video_url = data.get('url')
+        lane = data.get('lane', 'interactive')
+        
+        if not video_url:
+            return jsonify({'error': 'No video URL provided'}), 400
+        
+        job = job_queue.submit(video_url, user_id=current_user.get_id(), lane=lane)
+        return jsonify({'success': True, 'job_id': job.id, 'status': job.status}), 202
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error submitting job: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+@require_login
+def get_job(job_id):
+    try:
+        job = job_queue.get(job_id, user_id=current_user.get_id())
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        
+        job_data = job_queue.serialize(job)
+        if job.status == 'done' and session.get('video_data', {}).get('job_id') != job.id:
+            remember_video(job.video_url, json.loads(job.result))
+            session['video_data']['job_id'] = job.id
+        
+        return jsonify({'success': True, 'job': job_data})
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
 @app.route('/api/generate_quiz', methods=['POST'])
 @require_login
+@admission_controlled(generate_quiz_admission)
 def generate_quiz():
     try:
         data = request.json
@@ -88,8 +260,8 @@ def generate_quiz():
         num_questions = data.get('num_questions', 10)
         difficulty = data.get('difficulty', 'medium')
         
-        quiz = quiz_generator.generate(text, num_questions, difficulty)
-        return jsonify({'success': True, 'quiz': quiz})
+        quiz, source = quiz_generator.generate_with_source(text, num_questions, difficulty, deadline=g.deadline)
+        return jsonify({'success': True, 'quiz': quiz, 'source': source})
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -102,9 +274,13 @@ def chat():
         message = data.get('message', '')
         
         video_data = session.get('video_data', {})
-        context = video_data.get('transcript', '')
+        stored = None
+        if video_data.get('video_id'):
+            with stage('transcript_store', timing_name='db'):
+                stored = transcript_store.get(current_user.get_id(), video_data['video_id'])
+        context = stored.get('transcript', '') if stored else ''
         
-        response = chatbot.chat(message, context)
+        response = chatbot.chat(message, context, context_key=video_data.get('video_id'))
         return jsonify({'success': True, 'response': response})
         
     except Exception as e:
@@ -150,9 +326,83 @@ def download_quiz():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/admin/cache/invalidate', methods=['POST'])
+@require_admin
+def invalidate_cache():
+    try:
+        data = request.json or {}
+        if data.get('all'):
+            video_id = None
+        elif data.get('video_id'):
+            video_id = data['video_id']
+        elif data.get('url'):
+            video_id = canonical_video_id(data['url'])
+        else:
+            return jsonify({'error': 'Provide a url, video_id or all=true'}), 400
+        
+        removed = result_cache.invalidate(video_id)
+        return jsonify({'success': True, 'video_id': video_id, 'removed': removed})
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/admin/stats', methods=['GET'])
+@require_admin
+def admin_stats():
+    return jsonify({
+        'success': True,
+        'user_cache': user_cache.stats(),
+        'token_cache': token_cache.stats(),
+        'circuits': breaker_stats(),
+        'admission': admission_stats(),
+        'metadata_cache': video_processor.extractor_pool.metadata_cache.stats()
+    })
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    # Open by default for a scraper on the private network; set METRICS_TOKEN
+    # to require "Authorization: Bearer <token>".
+    token = os.environ.get('METRICS_TOKEN')
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
 @app.after_request
 def add_header(response):
+    # Registered first so it runs last, after finish_profiler may have
+    # replaced the response.
     response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
     response.headers['Pragma'] = 'no-cache'
     response.headers['Expires'] = '0'
     return response
+
+@app.after_request
+def record_request_time(response):
+    started = g.get('request_started')
+    if started is not None and request.path.startswith('/api/'):
+        elapsed = time.perf_counter() - started
+        HTTP_REQUEST_SECONDS.observe(elapsed, request.endpoint or 'unknown', str(response.status_code))
+        timings = dict(g.get('timings') or {})
+        timings['total'] = elapsed
+        response.headers['Server-Timing'] = server_timing_header(timings)
+    return response
+
+@app.after_request
+def finish_profiler(response):
+    # Registered after record_request_time and add_header so it runs
+    # before them and they apply to the profile response too.
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return response
+    profiler.disable()
+    if response.is_streamed:
+        # Only the setup before the stream has run by now; replacing the
+        # body would also drop the stream itself.
+        return response
+    output = io.StringIO()
+    stats = pstats.Stats(profiler, stream=output)
+    stats.sort_stats('cumulative').print_stats(int(os.environ.get('PROFILE_TOP', 40)))
+    return jsonify({
+        'profiled_status': response.status_code,
+        'profile': output.getvalue().splitlines()
+    })
@@ -0,0 +1,143 @@
+import os
+import math
+import time
+import itertools
+import threading
+from collections import Counter
+from typing import Dict
+from services.metrics import registry
+
+class Rejected(Exception):
+    def __init__(self, status: int, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+class _Waiter:
+    __slots__ = ('user_id', 'seq', 'granted')
+
+    def __init__(self, user_id, seq):
+        self.user_id = user_id
+        self.seq = seq
+        self.granted = False
+
+class AdmissionController:
+    # Caps concurrent work for one endpoint in this process. Each user may
+    # hold `per_user` slots, running or queued; past that they get a 429.
+    # When all `max_in_flight` slots are busy, up to `queue_size` requests
+    # wait, and a freed slot goes to the waiter whose user has the fewest
+    # requests running, so a busy user cannot starve the rest. A full queue
+    # or a wait past the timeout gets a 503. Limits can be overridden with
+    # ADMISSION_<NAME>_MAX_IN_FLIGHT, _PER_USER, _QUEUE_SIZE, _QUEUE_TIMEOUT.
+    def __init__(self, name: str, max_in_flight: int = 8, per_user: int = 2, queue_size: int = 16,
+                 queue_timeout: float = 15):
+        prefix = f"ADMISSION_{name.upper()}_"
+        self.name = name
+        self.max_in_flight = int(os.environ.get(prefix + 'MAX_IN_FLIGHT', max_in_flight))
+        self.per_user = int(os.environ.get(prefix + 'PER_USER', per_user))
+        self.queue_size = int(os.environ.get(prefix + 'QUEUE_SIZE', queue_size))
+        self.queue_timeout = float(os.environ.get(prefix + 'QUEUE_TIMEOUT', queue_timeout))
+        self.in_flight = 0
+        self.running = Counter()
+        self.held = Counter()
+        self.waiters = []
+        self.counters = Counter()
+        self.avg_seconds = 10.0
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        _controllers[name] = self
+
+    def acquire(self, user_id, timeout: float):
+        with self._cond:
+            if self.held[user_id] >= self.per_user:
+                self.counters['rejected_user_limit'] += 1
+                raise Rejected(429, 'Too many requests in progress for this user', self._retry_after(1))
+
+            if self.in_flight < self.max_in_flight and not self.waiters:
+                self._start(user_id)
+                return
+
+            if len(self.waiters) >= self.queue_size:
+                self.counters['rejected_queue_full'] += 1
+                raise Rejected(503, 'Server is busy, please retry shortly', self._retry_after(len(self.waiters)))
+
+            waiter = _Waiter(user_id, next(self._seq))
+            self.waiters.append(waiter)
+            self.held[user_id] += 1
+            self.counters['queued'] += 1
+            expires_at = time.monotonic() + timeout
+            while not waiter.granted:
+                remaining = expires_at - time.monotonic()
+                if remaining <= 0:
+                    self.waiters.remove(waiter)
+                    self._drop(self.held, user_id)
+                    self.counters['rejected_queue_timeout'] += 1
+                    raise Rejected(503, 'Server is busy, please retry shortly', self._retry_after(len(self.waiters)))
+                self._cond.wait(remaining)
+            self.counters['admitted'] += 1
+
+    def release(self, user_id, elapsed: float):
+        with self._cond:
+            self.avg_seconds = 0.8 * self.avg_seconds + 0.2 * elapsed
+            self.in_flight -= 1
+            self._drop(self.running, user_id)
+            self._drop(self.held, user_id)
+            while self.waiters and self.in_flight < self.max_in_flight:
+                waiter = min(self.waiters, key=lambda w: (self.running[w.user_id], w.seq))
+                self.waiters.remove(waiter)
+                waiter.granted = True
+                self.in_flight += 1
+                self.running[waiter.user_id] += 1
+            self._cond.notify_all()
+
+    def _start(self, user_id):
+        self.in_flight += 1
+        self.running[user_id] += 1
+        self.held[user_id] += 1
+        self.counters['admitted'] += 1
+
+    def _drop(self, counter: Counter, user_id):
+        counter[user_id] -= 1
+        if counter[user_id] <= 0:
+            del counter[user_id]
+
+    def _retry_after(self, ahead: int) -> int:
+        # Roughly how long until `ahead` requests have cleared the slots.
+        return max(1, math.ceil(self.avg_seconds * max(1, ahead) / max(1, self.max_in_flight)))
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                'in_flight': self.in_flight,
+                'queued_now': len(self.waiters),
+                'users_active': len(self.held),
+                'avg_seconds': round(self.avg_seconds, 2),
+                'limits': {
+                    'max_in_flight': self.max_in_flight,
+                    'per_user': self.per_user,
+                    'queue_size': self.queue_size,
+                    'queue_timeout': self.queue_timeout
+                },
+                **self.counters
+            }
+
+_controllers = {}
+
+def admission_stats() -> Dict[str, Dict]:
+    return {name: controller.stats() for name, controller in list(_controllers.items())}
+
+def _collect():
+    stats = admission_stats()
+    outcomes = ('admitted', 'queued', 'rejected_user_limit', 'rejected_queue_full', 'rejected_queue_timeout')
+    return [
+        ('admission_in_flight', 'gauge', 'Requests currently holding an admission slot.',
+         {(('endpoint', name),): s['in_flight'] for name, s in stats.items()}),
+        ('admission_queue_depth', 'gauge', 'Requests currently waiting for a slot.',
+         {(('endpoint', name),): s['queued_now'] for name, s in stats.items()}),
+        ('admission_decisions_total', 'counter', 'Admission decisions by outcome.',
+         {(('endpoint', name), ('outcome', outcome)): s.get(outcome, 0)
+          for name, s in stats.items() for outcome in outcomes}),
+    ]
+
+registry.register_collector(_collect)
@@ -0,0 +1,246 @@
+import re
+import json
+import codecs
+from array import array
+from bisect import bisect_right
+from typing import Dict, Iterable, Iterator, List, Union
+
+TAG_RE = re.compile(r'<[^>]+>|\{[^}]+\}')
+SPACE_RE = re.compile(r'\s+')
+VTT_TIMING_RE = re.compile(r'^((?:\d+:)?\d{1,2}:\d{2}[.,]\d{3})\s+-->\s+((?:\d+:)?\d{1,2}:\d{2}[.,]\d{3})')
+
+# Auto-captions roll: each cue repeats the tail of the previous one. Overlaps
+# shorter than this many words are kept, since a repeated "the" or "so" is
+# more likely speech than caption scrolling.
+MIN_OVERLAP_WORDS = 2
+
+class SegmentTable:
+    def __init__(self, dedupe: bool = False):
+        self.starts = array('d')
+        self.ends = array('d')
+        self.offsets = array('l')
+        self.dedupe = dedupe
+        self.removed_chars = 0
+        self._parts = []
+        self._length = 0
+        self._previous_words = []
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __bool__(self):
+        return len(self.starts) > 0
+
+    def append(self, start: float, end: float, text: str):
+        if self.dedupe:
+            text = self._strip_overlap(text)
+            if not text:
+                if self.ends:
+                    self.ends[-1] = max(self.ends[-1], end)
+                return
+        if self._parts:
+            self._length += 1
+        self.starts.append(start)
+        self.ends.append(end)
+        self.offsets.append(self._length)
+        self._parts.append(text)
+        self._length += len(text)
+
+    def _strip_overlap(self, text: str) -> str:
+        words = text.split(' ')
+        keys = [w.lower() for w in words]
+        previous = self._previous_words
+        self._previous_words = keys
+
+        overlap = suffix_prefix_overlap(previous, keys)
+        if overlap < len(keys) and overlap < MIN_OVERLAP_WORDS:
+            return text
+        kept = ' '.join(words[overlap:])
+        self.removed_chars += len(text) - len(kept)
+        return kept
+
+    @property
+    def transcript(self) -> str:
+        return ' '.join(self._parts)
+
+    def text(self, index: int) -> str:
+        return self._parts[index]
+
+    def locate(self, offset: int) -> int:
+        return max(0, bisect_right(self.offsets, offset) - 1)
+
+    def at_time(self, seconds: float) -> int:
+        return max(0, bisect_right(self.starts, seconds) - 1)
+
+    def to_dict(self) -> Dict[str, List]:
+        return {
+            'start': [round(t, 3) for t in self.starts],
+            'end': [round(t, 3) for t in self.ends],
+            'offset': list(self.offsets)
+        }
+
+def suffix_prefix_overlap(previous: List[str], current: List[str]) -> int:
+    # Longest k with previous[-k:] == current[:k], via the KMP failure
+    # function of `current` run over the tail of `previous`.
+    m = len(current)
+    if not m or not previous:
+        return 0
+    failure = [0] * m
+    k = 0
+    for i in range(1, m):
+        while k and current[i] != current[k]:
+            k = failure[k - 1]
+        if current[i] == current[k]:
+            k += 1
+        failure[i] = k
+
+    q = 0
+    for word in previous[-m:]:
+        if q == m:
+            q = failure[q - 1]
+        while q and word != current[q]:
+            q = failure[q - 1]
+        if word == current[q]:
+            q += 1
+    return q
+
+def parse_captions(chunks: Iterable[Union[str, bytes]], dedupe: bool = False) -> SegmentTable:
+    chunks = _decoded(chunks)
+    head = ''
+    for chunk in chunks:
+        head += chunk
+        if head.strip():
+            break
+    stream = _prepend(head, chunks)
+    if head.lstrip().startswith('{'):
+        return parse_json3(stream, dedupe)
+    return parse_vtt(_iter_lines(stream), dedupe)
+
+def parse_json3(chunks: Iterable[str], dedupe: bool = False) -> SegmentTable:
+    table = SegmentTable(dedupe)
+    for event in _iter_json_array(chunks, '"events"'):
+        segs = event.get('segs')
+        if not segs:
+            continue
+        text = _clean(''.join(seg.get('utf8', '') for seg in segs))
+        if not text:
+            continue
+        start = event.get('tStartMs', 0) / 1000.0
+        end = start + event.get('dDurationMs', 0) / 1000.0
+        table.append(start, end, text)
+    return table
+
+def parse_vtt(lines: Iterable[str], dedupe: bool = False) -> SegmentTable:
+    table = SegmentTable(dedupe)
+    start = end = None
+    cue_lines = []
+
+    def flush():
+        if start is not None and cue_lines:
+            text = _clean(' '.join(cue_lines))
+            if text:
+                table.append(start, end, text)
+
+    for line in lines:
+        # Only an empty line ends a cue; a line of spaces is cue text.
+        line = line.rstrip('\r\n')
+        text = line.strip()
+        timing = VTT_TIMING_RE.match(text)
+        if timing:
+            flush()
+            start, end = _vtt_seconds(timing.group(1)), _vtt_seconds(timing.group(2))
+            cue_lines = []
+        elif not line:
+            flush()
+            start = None
+            cue_lines = []
+        elif start is not None and text:
+            cue_lines.append(text)
+    flush()
+    return table
+
+def _clean(text: str) -> str:
+    return SPACE_RE.sub(' ', TAG_RE.sub('', text)).strip()
+
+def _vtt_seconds(stamp: str) -> float:
+    parts = stamp.replace(',', '.').split(':')
+    seconds = 0.0
+    for part in parts:
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+def _decoded(chunks: Iterable[Union[str, bytes]]) -> Iterator[str]:
+    decoder = None
+    for chunk in chunks:
+        if isinstance(chunk, bytes):
+            if decoder is None:
+                decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+            chunk = decoder.decode(chunk)
+        if chunk:
+            yield chunk
+
+def _prepend(head: str, chunks: Iterator[str]) -> Iterator[str]:
+    yield head
+    yield from chunks
+
+def _iter_lines(chunks: Iterable[str]) -> Iterator[str]:
+    pending = ''
+    for chunk in chunks:
+        pending += chunk
+        lines = pending.split('\n')
+        pending = lines.pop()
+        yield from lines
+    if pending:
+        yield pending
+
+def _iter_json_array(chunks: Iterable[str], key: str) -> Iterator[Dict]:
+    # Decodes one array element at a time so only the element being read is
+    # buffered, never the whole caption document.
+    decoder = json.JSONDecoder()
+    chunks = iter(chunks)
+    buffer = ''
+    position = 0
+    in_array = False
+
+    def fill():
+        nonlocal buffer, position
+        chunk = next(chunks, None)
+        if chunk is None:
+            return False
+        buffer = buffer[position:] + chunk
+        position = 0
+        return True
+
+    while not in_array:
+        key_at = buffer.find(key, position)
+        bracket_at = buffer.find('[', key_at) if key_at != -1 else -1
+        if bracket_at != -1:
+            position = bracket_at + 1
+            in_array = True
+            continue
+        if key_at != -1:
+            position = key_at
+        else:
+            # Keep a tail in case the key is split across chunks.
+            position = max(position, len(buffer) - len(key))
+        if not fill():
+            return
+
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if position >= len(buffer):
+            if not fill():
+                return
+            continue
+        if buffer[position] == ']':
+            return
+        try:
+            element, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if not fill():
+                return
+            continue
+        position = end
+        if isinstance(element, dict):
+            yield element
@@ -1,14 +1,13 @@
 import os
-import google.generativeai as genai
+from services.retrieval import TranscriptRetriever
+from services.llm_gateway import get_gateway
 
 class LordNilChatbot:
     def __init__(self):
-        api_key = os.environ.get("GEMINI_API_KEY")
-        if api_key:
-            genai.configure(api_key=api_key)
-            self.model = genai.GenerativeModel('gemini-1.5-flash')
-        else:
-            self.model = None
+        self.llm = get_gateway()
+        
+        self.retriever = TranscriptRetriever()
+        self.context_token_budget = int(os.environ.get('CHAT_CONTEXT_TOKENS', 1200))
         
         self.system_prompt = """You are LORD NIL, a helpful and friendly AI assistant integrated into an educational video summarizer platform. 
 
@@ -25,20 +24,23 @@ When users ask about the platform:
 
 Always be respectful and supportive. Help users learn effectively!"""
     
-    def chat(self, message: str, context: str = None) -> str:
-        if not self.model:
+    def chat(self, message: str, context: str = None, context_key: str = None) -> str:
+        if not self.llm.available:
             return "I'm sorry, I'm not available right now. Please check if the API key is configured correctly."
         
         try:
             prompt = self.system_prompt + "\n\n"
             
             if context:
-                prompt += f"Current video context:\n{context[:2000]}\n\n"
+                passages = self.retriever.select(context, message, key=context_key,
+                                                 token_budget=self.context_token_budget)
+                if passages:
+                    excerpts = '\n\n'.join(f"[Excerpt {i}] {p}" for i, p in enumerate(passages, 1))
+                    prompt += f"Relevant excerpts from the current video:\n{excerpts}\n\n"
             
             prompt += f"User message: {message}\n\nLORD NIL response:"
             
-            response = self.model.generate_content(prompt)
-            return response.text
+            return self.llm.generate(prompt)
             
         except Exception as e:
             return f"I encountered an error: {str(e)}. Please try again."
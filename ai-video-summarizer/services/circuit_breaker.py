@@ -0,0 +1,117 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from typing import Dict
+from services.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class CircuitBreaker:
+    # Trips when, over the last `window` calls, the share that failed or
+    # ran past the latency SLO reaches `failure_ratio`. While open every
+    # call is refused; after `reset_after` seconds one trial call is let
+    # through and its outcome closes or re-opens the circuit.
+    def __init__(self, name: str, latency_slo: float = None, failure_ratio: float = None,
+                 window: int = None, min_calls: int = None, reset_after: float = None):
+        self.name = name
+        self.latency_slo = latency_slo or float(os.environ.get('LLM_LATENCY_SLO', 15))
+        self.failure_ratio = failure_ratio or float(os.environ.get('CIRCUIT_FAILURE_RATIO', 0.5))
+        self.min_calls = min_calls or int(os.environ.get('CIRCUIT_MIN_CALLS', 5))
+        self.reset_after = reset_after or float(os.environ.get('CIRCUIT_RESET_AFTER', 30))
+        self.outcomes = deque(maxlen=window or int(os.environ.get('CIRCUIT_WINDOW', 20)))
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return self.state == OPEN and time.monotonic() - self.opened_at < self.reset_after
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_after:
+                self.state = HALF_OPEN
+                self.trial_in_flight = False
+            if self.state == HALF_OPEN and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def reject(self):
+        # For callers that refuse a call on is_open without asking allow().
+        with self._lock:
+            self.rejected += 1
+
+    def record(self, latency: float, ok: bool = True):
+        good = ok and latency <= self.latency_slo
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.trial_in_flight = False
+                if good:
+                    logger.info(f"Circuit '{self.name}' closed after a healthy trial call")
+                    self.state = CLOSED
+                    self.outcomes.clear()
+                else:
+                    self._open()
+                return
+            if self.state == OPEN:
+                # A straggler that started before the circuit opened.
+                return
+            self.outcomes.append(good)
+            failures = self.outcomes.count(False)
+            if len(self.outcomes) >= self.min_calls and failures / len(self.outcomes) >= self.failure_ratio:
+                self._open()
+
+    def _open(self):
+        logger.warning(f"Circuit '{self.name}' opened; skipping it for {self.reset_after}s")
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.outcomes.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'state': self.state,
+                'recent_calls': len(self.outcomes),
+                'recent_failures': self.outcomes.count(False),
+                'rejected': self.rejected
+            }
+
+_breakers = {}
+_breaker_lock = threading.Lock()
+
+def get_breaker(name: str) -> CircuitBreaker:
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breaker_lock:
+            breaker = _breakers.get(name)
+            if breaker is None:
+                breaker = CircuitBreaker(name)
+                _breakers[name] = breaker
+    return breaker
+
+def breaker_stats() -> Dict[str, Dict]:
+    return {name: breaker.stats() for name, breaker in list(_breakers.items())}
+
+def _collect():
+    stats = breaker_stats()
+    return [
+        ('circuit_open', 'gauge', '1 while the provider circuit is open or half-open.',
+         {(('provider', name),): int(s['state'] != CLOSED) for name, s in stats.items()}),
+        ('circuit_rejected_total', 'counter', 'Calls refused by an open circuit.',
+         {(('provider', name),): s['rejected'] for name, s in stats.items()}),
+    ]
+
+registry.register_collector(_collect)
@@ -0,0 +1,123 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+from services.metrics import current_timings, bound_timings
+
+logger = logging.getLogger(__name__)
+
+_executors = {}
+_executor_lock = threading.Lock()
+
+# Work that fans out from inside a pooled task gets its own pool; waiting on
+# the pool you are running in deadlocks once every worker is a waiter.
+POOL_SIZES = {
+    'llm': ('LLM_MAX_WORKERS', 8),
+    'summary_map': ('SUMMARY_MAP_CONCURRENCY', 4),
+    'subtitles': ('SUBTITLE_FETCH_CONCURRENCY', 8),
+    'hedge': ('HEDGE_MAX_WORKERS', 16),
+    'extract': ('YTDLP_POOL_SIZE', 4),
+}
+
+def get_executor(name: str = 'llm') -> ThreadPoolExecutor:
+    executor = _executors.get(name)
+    if executor is None:
+        with _executor_lock:
+            executor = _executors.get(name)
+            if executor is None:
+                env_var, default = POOL_SIZES.get(name, (None, 4))
+                max_workers = int(os.environ.get(env_var, default)) if env_var else default
+                executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+                _executors[name] = executor
+    return executor
+
+def submit(executor: ThreadPoolExecutor, fn: Callable, *args, **kwargs) -> Future:
+    # Carries the caller's per-request timings onto the pool thread. Only
+    # that, not the whole context: Flask's request and app contexts (and
+    # the SQLAlchemy session scoped to them) must stay on their own thread.
+    timings = current_timings()
+
+    def run():
+        with bound_timings(timings):
+            return fn(*args, **kwargs)
+    return executor.submit(run)
+
+class Task(NamedTuple):
+    fn: Callable[[], Any]
+    timeout: float
+    # Called with why fn's result is not used: 'error' or 'timeout'.
+    fallback: Callable[[str], Any]
+
+def gather(tasks: Dict[str, Task], on_done: Optional[Callable[[str, Any], None]] = None) -> Dict[str, Any]:
+    executor = get_executor()
+    started = time.monotonic()
+    futures = {submit(executor, task.fn): name for name, task in tasks.items()}
+    deadlines = {name: started + task.timeout for name, task in tasks.items()}
+    results = {}
+
+    def finish(name, value):
+        results[name] = value
+        if on_done:
+            on_done(name, value)
+
+    pending = set(futures)
+    while pending:
+        next_deadline = min(deadlines[futures[f]] for f in pending)
+        done, pending = wait(pending, timeout=max(0, next_deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+
+        for future in done:
+            name = futures[future]
+            try:
+                finish(name, future.result())
+            except Exception as e:
+                logger.error(f"Task '{name}' failed, using fallback: {str(e)}")
+                finish(name, tasks[name].fallback('error'))
+
+        now = time.monotonic()
+        for future in [f for f in pending if deadlines[futures[f]] <= now]:
+            name = futures[future]
+            # The worker thread cannot be interrupted; it finishes in the
+            # background and its result is discarded.
+            future.cancel()
+            pending.discard(future)
+            logger.warning(f"Task '{name}' exceeded {tasks[name].timeout}s, using fallback")
+            finish(name, tasks[name].fallback('timeout'))
+
+    return results
+
+def hedge(primary: Callable[[], Any], fallback: Callable[[], Any], hedge_after: float, deadline: float) -> Tuple[Any, bool]:
+    # Runs primary on the hedge pool; if it has not succeeded within
+    # hedge_after seconds (or fails sooner) runs fallback on the calling
+    # thread. fallback must be cheap and local: it is needed most when the
+    # pool is full of primaries stuck on a slow provider, and then a pooled
+    # fallback would queue behind them. Returns primary's result if it is in
+    # by the time fallback finishes, otherwise fallback's; the second value
+    # is True when fallback's result is returned. If fallback fails, waits
+    # for primary until deadline and raises if it does not succeed either.
+    started = time.monotonic()
+    primary_future = submit(get_executor('hedge'), primary)
+    wait([primary_future], timeout=hedge_after)
+    if primary_future.done() and primary_future.exception() is None:
+        return primary_future.result(), False
+    if primary_future.done():
+        logger.warning(f"Primary failed, using fallback: {str(primary_future.exception())}")
+
+    try:
+        value = fallback()
+    except Exception as e:
+        logger.warning(f"Fallback failed while hedged: {str(e)}")
+        remaining = deadline - (time.monotonic() - started)
+        wait([primary_future], timeout=max(0, remaining))
+        if primary_future.done() and primary_future.exception() is None:
+            return primary_future.result(), False
+        primary_future.cancel()
+        raise
+
+    if primary_future.done() and primary_future.exception() is None:
+        return primary_future.result(), False
+    # Drops primary if it is still queued behind stuck work; once running it
+    # cannot be interrupted and its result is discarded.
+    primary_future.cancel()
+    return value, True
@@ -0,0 +1,44 @@
+import os
+import time
+
+class DeadlineExceeded(Exception):
+    pass
+
+class Deadline:
+    # A request's overall time budget, passed down so each stage can size its
+    # own timeout from what is left instead of using a fixed one.
+    def __init__(self, budget: float):
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+
+    @classmethod
+    def for_request(cls) -> 'Deadline':
+        # Leave headroom under the proxy's limit for serializing the response.
+        return cls(float(os.environ.get('REQUEST_BUDGET', 50)))
+
+    @classmethod
+    def unbounded(cls) -> 'Deadline':
+        return cls(float('inf'))
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, cap: float, reserve: float = 0.0) -> float:
+        # The time a stage may take: at most `cap`, and never eating into the
+        # `reserve` that later stages need.
+        return max(0.0, min(cap, self.remaining() - reserve))
+
+    def reserve(self, seconds: float) -> 'Deadline':
+        # A deadline for an early stage that leaves `seconds` for the rest.
+        child = Deadline(0)
+        child.budget = max(0.0, self.budget - seconds)
+        child.expires_at = self.expires_at - seconds
+        return child
+
+    def check(self, stage: str):
+        if self.expired:
+            raise DeadlineExceeded(f"Request budget of {self.budget:.0f}s exhausted before {stage}")
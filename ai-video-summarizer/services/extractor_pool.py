@@ -0,0 +1,80 @@
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Dict
+import yt_dlp
+from services.ttl_cache import TTLCache
+
+METADATA_FIELDS = (
+    'id', 'title', 'description', 'duration', 'channel', 'uploader', 'thumbnail',
+    'view_count', 'language', 'tags', 'categories',
+)
+SUBTITLE_EXTS = ('json3', 'vtt')
+
+class ExtractorPool:
+    def __init__(self, ydl_opts: Dict, size: int = None, metadata_ttl: int = None, max_cached: int = None):
+        self.ydl_opts = ydl_opts
+        self.size = size or int(os.environ.get('YTDLP_POOL_SIZE', 4))
+        self.metadata_cache = TTLCache(
+            max_entries=max_cached or int(os.environ.get('METADATA_CACHE_SIZE', 512)),
+            ttl_seconds=metadata_ttl or int(os.environ.get('METADATA_CACHE_TTL', 3600))
+        )
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _checkout(self):
+        try:
+            ydl = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            ydl = yt_dlp.YoutubeDL(self.ydl_opts) if can_create else self._idle.get()
+        try:
+            yield ydl
+        finally:
+            self._idle.put(ydl)
+
+    def extract(self, url: str, cache_key: str = None) -> Dict:
+        if cache_key:
+            cached = self.metadata_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        with self._checkout() as ydl:
+            info = ydl.extract_info(url, download=False)
+        trimmed = self._trim(info)
+
+        if cache_key:
+            self.metadata_cache.set(cache_key, trimmed)
+        return trimmed
+
+    def _trim(self, info: Dict) -> Dict:
+        trimmed = {field: info.get(field) for field in METADATA_FIELDS if info.get(field) is not None}
+        trimmed['chapters'] = [
+            {'title': ch.get('title', ''), 'start_time': ch.get('start_time'), 'end_time': ch.get('end_time')}
+            for ch in info.get('chapters') or []
+        ]
+        trimmed['subtitles'] = self._trim_tracks(info.get('subtitles') or {})
+        trimmed['automatic_captions'] = self._trim_tracks(info.get('automatic_captions') or {})
+        return trimmed
+
+    def _trim_tracks(self, tracks: Dict) -> Dict:
+        # Keep the formats the transcript parser reads, plus the first entry of
+        # each language, which is what the any-language fallback picks.
+        trimmed = {}
+        for lang, entries in tracks.items():
+            if not isinstance(entries, list) or not entries:
+                continue
+            kept = [
+                {'ext': sub.get('ext'), 'url': sub.get('url')}
+                for index, sub in enumerate(entries)
+                if sub.get('url') and (index == 0 or sub.get('ext') in SUBTITLE_EXTS)
+            ]
+            if kept:
+                trimmed[lang] = kept
+        return trimmed
@@ -0,0 +1,129 @@
+import os
+import json
+import uuid
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import update
+from app import db
+from models import Job
+
+logger = logging.getLogger(__name__)
+
+LANE_PRIORITIES = {
+    'interactive': 0,
+    'batch': 10,
+}
+
+class JobQueue:
+    def __init__(self, max_attempts: int = None, stale_after_seconds: int = None):
+        self.max_attempts = max_attempts or int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+        self.stale_after = timedelta(seconds=stale_after_seconds or int(os.environ.get('JOB_STALE_AFTER', 600)))
+
+    def submit(self, video_url: str, user_id: str = None, lane: str = 'interactive') -> Job:
+        if lane not in LANE_PRIORITIES:
+            raise ValueError(f"Unknown lane '{lane}', expected one of: {', '.join(LANE_PRIORITIES)}")
+
+        job = Job(
+            id=uuid.uuid4().hex,
+            user_id=user_id,
+            video_url=video_url,
+            lane=lane,
+            priority=LANE_PRIORITIES[lane],
+            status='queued',
+            created_at=datetime.now()
+        )
+        db.session.add(job)
+        db.session.commit()
+        return job
+
+    def get(self, job_id: str, user_id: str = None) -> Optional[Job]:
+        query = Job.query.filter_by(id=job_id)
+        if user_id is not None:
+            query = query.filter_by(user_id=user_id)
+        return query.first()
+
+    def claim(self, worker_id: str, lanes: List[str] = None) -> Optional[Job]:
+        query = db.session.query(Job.id).filter(Job.status == 'queued')
+        if lanes:
+            query = query.filter(Job.lane.in_(lanes))
+        candidates = [row.id for row in query.order_by(Job.priority, Job.created_at).limit(5)]
+
+        # Several workers may see the same candidates; the conditional UPDATE
+        # only matches while the row is still queued, so exactly one wins.
+        for job_id in candidates:
+            now = datetime.now()
+            claimed = db.session.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.status == 'queued')
+                .values(status='running', worker_id=worker_id, started_at=now,
+                        heartbeat_at=now, attempts=Job.attempts + 1)
+            ).rowcount
+            db.session.commit()
+            if claimed == 1:
+                return db.session.get(Job, job_id, populate_existing=True)
+        return None
+
+    def update_progress(self, job_id: str, stage: str, partial: Dict):
+        db.session.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status == 'running')
+            .values(stage=stage, result=json.dumps(partial), heartbeat_at=datetime.now())
+        )
+        db.session.commit()
+
+    def complete(self, job_id: str, result: Dict):
+        db.session.execute(
+            update(Job)
+            .where(Job.id == job_id)
+            .values(status='done', stage='done', result=json.dumps(result), error=None, finished_at=datetime.now())
+        )
+        db.session.commit()
+
+    def fail(self, job_id: str, error: str):
+        job = db.session.get(Job, job_id, populate_existing=True)
+        if job is None:
+            return
+        if job.attempts < self.max_attempts:
+            job.status = 'queued'
+            job.worker_id = None
+        else:
+            job.status = 'failed'
+            job.finished_at = datetime.now()
+        job.error = error
+        db.session.commit()
+
+    def requeue_stale(self) -> int:
+        now = datetime.now()
+        cutoff = now - self.stale_after
+        db.session.execute(
+            update(Job)
+            .where(Job.status == 'running', Job.heartbeat_at < cutoff, Job.attempts >= self.max_attempts)
+            .values(status='failed', error='Worker stopped responding', finished_at=now)
+        )
+        requeued = db.session.execute(
+            update(Job)
+            .where(Job.status == 'running', Job.heartbeat_at < cutoff)
+            .values(status='queued', worker_id=None)
+        ).rowcount
+        db.session.commit()
+        if requeued:
+            logger.warning(f"Requeued {requeued} stale jobs")
+        return requeued
+
+    def serialize(self, job: Job) -> Dict:
+        result = json.loads(job.result) if job.result else {}
+        result.pop('transcript', None)
+        result.pop('segments', None)
+        return {
+            'id': job.id,
+            'status': job.status,
+            'stage': job.stage,
+            'lane': job.lane,
+            'video_url': job.video_url,
+            'attempts': job.attempts,
+            'error': job.error,
+            'result': result,
+            'created_at': job.created_at.isoformat() if job.created_at else None,
+            'finished_at': job.finished_at.isoformat() if job.finished_at else None
+        }
@@ -0,0 +1,305 @@
+import os
+import time
+import random
+import logging
+import threading
+from typing import Callable, Iterator, Optional
+from services.circuit_breaker import get_breaker
+from services.metrics import LLM_CALL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Reported as the source of results produced locally instead of by a model.
+FALLBACK_SOURCE = 'extractive'
+
+class LLMError(Exception):
+    pass
+
+class RetryableLLMError(LLMError):
+    pass
+
+class RateLimitTimeout(LLMError):
+    pass
+
+class CircuitOpenError(LLMError):
+    pass
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+class TokenBucket:
+    # Refills continuously at rate_per_minute up to one minute's worth.
+    # consume() may drive the level negative (output tokens are only known
+    # after the call); later acquires then wait the debt off.
+    def __init__(self, rate_per_minute: float):
+        self.capacity = float(rate_per_minute)
+        self.rate = rate_per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount: float, timeout: float) -> bool:
+        amount = min(amount, self.capacity)
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.level >= amount:
+                    self.level -= amount
+                    return True
+                wait = (amount - self.level) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(min(wait, 1.0))
+
+    def consume(self, amount: float):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.level -= amount
+
+class GeminiProvider:
+    name = 'gemini'
+
+    def __init__(self, model_name: str = None, api_key: str = None):
+        import google.generativeai as genai
+        from google.api_core import exceptions as google_exceptions
+
+        genai.configure(api_key=api_key or os.environ.get('GEMINI_API_KEY'))
+        self.model = genai.GenerativeModel(model_name or 'gemini-1.5-flash')
+        self.retryable = (
+            google_exceptions.TooManyRequests,
+            google_exceptions.ResourceExhausted,
+            google_exceptions.ServiceUnavailable,
+            google_exceptions.InternalServerError,
+            google_exceptions.DeadlineExceeded,
+        )
+
+    def generate(self, prompt: str, timeout: float) -> str:
+        response = self.model.generate_content(prompt, request_options={'timeout': timeout})
+        return response.text
+
+    def stream(self, prompt: str, timeout: float) -> Iterator[str]:
+        for chunk in self.model.generate_content(prompt, stream=True, request_options={'timeout': timeout}):
+            if chunk.text:
+                yield chunk.text
+
+    def is_retryable(self, error: Exception) -> bool:
+        return isinstance(error, self.retryable)
+
+class OpenAIProvider:
+    name = 'openai'
+
+    def __init__(self, model_name: str = None, api_key: str = None):
+        import openai
+
+        # The client keeps one pooled keep-alive HTTP connection set; retries
+        # are done by the gateway, so the SDK's own are turned off.
+        self.client = openai.OpenAI(api_key=api_key or os.environ.get('OPENAI_API_KEY'), max_retries=0)
+        self.model_name = model_name or 'gpt-4o-mini'
+        self.retryable = (
+            openai.RateLimitError,
+            openai.APITimeoutError,
+            openai.APIConnectionError,
+            openai.InternalServerError,
+        )
+
+    def generate(self, prompt: str, timeout: float) -> str:
+        response = self.client.chat.completions.create(
+            model=self.model_name,
+            messages=[{'role': 'user', 'content': prompt}],
+            timeout=timeout
+        )
+        return response.choices[0].message.content or ''
+
+    def stream(self, prompt: str, timeout: float) -> Iterator[str]:
+        response = self.client.chat.completions.create(
+            model=self.model_name,
+            messages=[{'role': 'user', 'content': prompt}],
+            stream=True,
+            timeout=timeout
+        )
+        for chunk in response:
+            text = chunk.choices[0].delta.content if chunk.choices else None
+            if text:
+                yield text
+
+    def is_retryable(self, error: Exception) -> bool:
+        return isinstance(error, self.retryable)
+
+class FakeProvider:
+    # Local stand-in for tests and offline runs. Replies come from `respond`
+    # (default: a canned markdown note echoing the prompt's opening), after
+    # `latency` seconds; `fail_rate` of calls raise a retryable error.
+    name = 'fake'
+
+    def __init__(self, respond: Callable[[str], str] = None, latency: float = None, fail_rate: float = None):
+        self.respond = respond or self._default_response
+        self.latency = latency if latency is not None else float(os.environ.get('LLM_FAKE_LATENCY', 0))
+        self.fail_rate = fail_rate if fail_rate is not None else float(os.environ.get('LLM_FAKE_FAIL_RATE', 0))
+
+    def _default_response(self, prompt: str) -> str:
+        opening = ' '.join(prompt.split()[:40])
+        return f"## FINAL SUMMARY\n{opening}\n\n## KEY TAKEAWAYS\n- This is a fake response generated locally for testing."
+
+    def generate(self, prompt: str, timeout: float) -> str:
+        if self.latency:
+            time.sleep(min(self.latency, timeout))
+        if self.fail_rate and random.random() < self.fail_rate:
+            raise RetryableLLMError('fake provider failure')
+        return self.respond(prompt)
+
+    def stream(self, prompt: str, timeout: float) -> Iterator[str]:
+        text = self.generate(prompt, timeout)
+        for start in range(0, len(text), 40):
+            yield text[start:start + 40]
+
+    def is_retryable(self, error: Exception) -> bool:
+        return isinstance(error, RetryableLLMError)
+
+PROVIDERS = {
+    'gemini': GeminiProvider,
+    'openai': OpenAIProvider,
+    'fake': FakeProvider,
+}
+
+class LLMGateway:
+    def __init__(self, provider=None, requests_per_minute: float = None, tokens_per_minute: float = None,
+                 max_retries: int = None, timeout: float = None):
+        self.provider = provider
+        self.breaker = get_breaker(provider.name) if provider is not None else None
+        self.request_bucket = TokenBucket(requests_per_minute or float(os.environ.get('LLM_RPM', 60)))
+        self.token_bucket = TokenBucket(tokens_per_minute or float(os.environ.get('LLM_TPM', 200000)))
+        self.max_retries = max_retries if max_retries is not None else int(os.environ.get('LLM_MAX_RETRIES', 3))
+        self.timeout = timeout or float(os.environ.get('LLM_TIMEOUT', 60))
+        self.backoff_base = float(os.environ.get('LLM_BACKOFF_BASE', 1.0))
+        self.backoff_cap = float(os.environ.get('LLM_BACKOFF_CAP', 20.0))
+
+    @property
+    def available(self) -> bool:
+        return self.provider is not None
+
+    @property
+    def healthy(self) -> bool:
+        return self.available and not self.breaker.is_open
+
+    def unavailable_reason(self) -> Optional[str]:
+        if not self.available:
+            return 'no_provider'
+        if self.breaker.is_open:
+            return 'circuit_open'
+        return None
+
+    @property
+    def source(self) -> Optional[str]:
+        return self.provider.name if self.provider is not None else None
+
+    def generate(self, prompt: str, timeout: float = None) -> str:
+        # `timeout` bounds the whole call, retries and backoff included.
+        expires_at = time.monotonic() + (self.timeout if timeout is None else timeout)
+        for attempt in range(self.max_retries + 1):
+            self._admit(prompt, expires_at - time.monotonic())
+            started = time.monotonic()
+            try:
+                text = self.provider.generate(prompt, max(0.0, expires_at - started))
+            except Exception as e:
+                self._record(time.monotonic() - started, ok=False)
+                self._retry_or_raise(e, attempt, expires_at)
+                continue
+            self._record(time.monotonic() - started)
+            self.token_bucket.consume(estimate_tokens(text))
+            return text
+    
+    def stream(self, prompt: str, timeout: float = None) -> Iterator[str]:
+        expires_at = time.monotonic() + (self.timeout if timeout is None else timeout)
+        for attempt in range(self.max_retries + 1):
+            self._admit(prompt, expires_at - time.monotonic())
+            started = time.monotonic()
+            produced = 0
+            try:
+                for text in self.provider.stream(prompt, max(0.0, expires_at - started)):
+                    if not produced:
+                        # Time to first token is what the SLO guards here.
+                        self._record(time.monotonic() - started)
+                    produced += len(text)
+                    yield text
+            except Exception as e:
+                # Once text has reached the caller a retry would repeat it.
+                if produced:
+                    raise
+                self._record(time.monotonic() - started, ok=False)
+                self._retry_or_raise(e, attempt, expires_at)
+                continue
+            else:
+                if not produced:
+                    self._record(time.monotonic() - started)
+            finally:
+                if produced:
+                    self.token_bucket.consume(max(1, produced // 4))
+            return
+    
+    def _record(self, latency: float, ok: bool = True):
+        self.breaker.record(latency, ok)
+        LLM_CALL_SECONDS.observe(latency, self.provider.name, 'ok' if ok else 'error')
+
+    def _admit(self, prompt: str, timeout: float):
+        if not self.available:
+            raise LLMError('No LLM provider configured')
+        if timeout <= 0:
+            raise LLMError('No time left for an LLM call')
+        if self.breaker.is_open:
+            # Refused before the rate limiters so an open circuit costs no
+            # tokens; allow() is not reached, so count the refusal here.
+            self.breaker.reject()
+            raise CircuitOpenError(f"Circuit for '{self.provider.name}' is open")
+        expires_at = time.monotonic() + timeout
+        if not self.request_bucket.acquire(1, timeout):
+            raise RateLimitTimeout(f'Request rate limit not available within {timeout:.1f}s')
+        if not self.token_bucket.acquire(estimate_tokens(prompt), max(0.0, expires_at - time.monotonic())):
+            raise RateLimitTimeout(f'Token rate limit not available within {timeout:.1f}s')
+        # Checked again last: in the half-open state allow() hands out the
+        # single trial call, which must then actually be made.
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"Circuit for '{self.provider.name}' is open")
+
+    def _retry_or_raise(self, error: Exception, attempt: int, expires_at: float):
+        if attempt >= self.max_retries or not self.provider.is_retryable(error):
+            raise error
+        # Full jitter keeps a burst of callers that failed together from
+        # retrying together.
+        delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+        if time.monotonic() + delay >= expires_at:
+            # No time for another attempt; don't hold the thread or spend
+            # rate-limit tokens on one the caller has stopped waiting for.
+            raise error
+        logger.warning(f"{self.provider.name} call failed ({type(error).__name__}), retry {attempt + 1} in {delay:.1f}s")
+        time.sleep(delay)
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+def create_provider(name: str = None):
+    name = name or os.environ.get('LLM_PROVIDER') or ('gemini' if os.environ.get('GEMINI_API_KEY') else None)
+    if not name:
+        return None
+    try:
+        provider_class = PROVIDERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown LLM_PROVIDER '{name}'")
+    if name == 'fake':
+        return provider_class()
+    return provider_class(os.environ.get('LLM_MODEL'))
+
+def get_gateway() -> LLMGateway:
+    # One gateway per process so every generator shares the client, its
+    # connection pool and the rate limits.
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = LLMGateway(create_provider())
+    return _gateway
@@ -0,0 +1,206 @@
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# In-process metrics rendered in the Prometheus text format at /metrics.
+# Recording is a dict lookup and an add under a per-metric lock; values that
+# other objects already count (cache hits, breaker state) are read by
+# collectors only when scraped. Each process keeps its own registry.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 45, 60)
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self) -> Iterator[Tuple[str, str, float]]:
+        with self._lock:
+            values = list(self._values.items())
+        for label_values, value in values:
+            yield self.name, _format_labels(self.labels, label_values), value
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # Per-bucket (not cumulative) counts, one extra for +Inf, then sum.
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, *label_values):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *label_values)
+
+    def samples(self) -> Iterator[Tuple[str, str, float]]:
+        with self._lock:
+            series = [(label_values, list(counts)) for label_values, counts in self._series.items()]
+        for label_values, counts in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                yield self.name + '_bucket', _format_labels(self.labels, label_values, f'le="{_format_value(bound)}"'), cumulative
+            yield self.name + '_count', _format_labels(self.labels, label_values), cumulative
+            yield self.name + '_sum', _format_labels(self.labels, label_values), counts[-1]
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def register_collector(self, collect: Callable[[], List[Tuple[str, str, str, Dict[Tuple, float]]]]):
+        # collect() returns (name, type, help, {label pairs tuple: value}) rows.
+        with self._lock:
+            self._collectors.append(collect)
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+
+        for collect in collectors:
+            for name, kind, documentation, samples in collect():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                for label_pairs, value in samples.items():
+                    labels = _format_labels([k for k, _ in label_pairs], [v for _, v in label_pairs])
+                    lines.append(f"{name}{labels} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+registry = Registry()
+
+STAGE_SECONDS = registry.histogram(
+    'pipeline_stage_seconds', 'Time spent in each video pipeline stage.', ['stage'])
+FALLBACKS = registry.counter(
+    'generation_fallbacks_total', 'Summaries and quizzes produced by the extractive path, by reason.', ['stage', 'reason'])
+PDF_RENDER_SECONDS = registry.histogram(
+    'pdf_render_seconds', 'Time to render a PDF download.', ['document'])
+LLM_CALL_SECONDS = registry.histogram(
+    'llm_call_seconds', 'Latency of individual LLM provider calls.', ['provider', 'outcome'])
+HTTP_REQUEST_SECONDS = registry.histogram(
+    'http_request_seconds', 'API request latency by endpoint and status.', ['endpoint', 'status'])
+
+# Per-request stage totals for the Server-Timing header. Work handed to a
+# pool carries the dict along (see concurrency.submit), so stages timed on
+# worker threads land in the same place.
+_request_timings = ContextVar('request_timings', default=None)
+
+def start_request_timings() -> Dict[str, float]:
+    timings = {}
+    _request_timings.set(timings)
+    return timings
+
+def current_timings() -> Optional[Dict[str, float]]:
+    return _request_timings.get()
+
+@contextmanager
+def bound_timings(timings: Optional[Dict[str, float]]):
+    token = _request_timings.set(timings)
+    try:
+        yield
+    finally:
+        _request_timings.reset(token)
+
+def record_timing(name: str, seconds: float):
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+def observe_stage(name: str, seconds: float, timing_name: str = None):
+    STAGE_SECONDS.observe(seconds, name)
+    record_timing(timing_name or name, seconds)
+
+@contextmanager
+def stage(name: str, timing_name: str = None):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - started, timing_name)
+
+def server_timing_header(timings: Dict[str, float]) -> str:
+    return ', '.join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items())
+
+def timings_ms(timings: Dict[str, float]) -> Dict[str, float]:
+    return {name: round(seconds * 1000, 1) for name, seconds in timings.items()}
+
+def register_caches(caches: Dict[str, object]):
+    # Exposes the hit/miss counts the caches already keep (anything with a
+    # stats() returning 'hits' and 'misses'), so lookups pay nothing extra.
+    def collect():
+        stats = {name: cache.stats() for name, cache in caches.items()}
+        return [
+            ('cache_hits_total', 'counter', 'Cache hits.',
+             {(('cache', name),): s['hits'] for name, s in stats.items()}),
+            ('cache_misses_total', 'counter', 'Cache misses.',
+             {(('cache', name),): s['misses'] for name, s in stats.items()}),
+            ('cache_entries', 'gauge', 'Entries currently held in memory.',
+             {(('cache', name),): s['size'] for name, s in stats.items() if 'size' in s}),
+        ]
+    registry.register_collector(collect)
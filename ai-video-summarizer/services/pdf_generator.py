@@ -6,6 +6,8 @@ from reportlab.lib.enums import TA_JUSTIFY, TA_LEFT, TA_CENTER
 from reportlab.lib.colors import HexColor
 import io
 import re
+import time
+from services.metrics import PDF_RENDER_SECONDS, record_timing
 
 class PDFGenerator:
     def __init__(self):
@@ -50,6 +52,7 @@ class PDFGenerator:
         ))
     
     def generate_summary_pdf(self, title: str, summary_data: dict) -> bytes:
+        started = time.perf_counter()
         buffer = io.BytesIO()
         doc = SimpleDocTemplate(buffer, pagesize=A4, 
                                rightMargin=50, leftMargin=50,
@@ -103,9 +106,13 @@ class PDFGenerator:
         
         doc.build(story)
         buffer.seek(0)
+        elapsed = time.perf_counter() - started
+        PDF_RENDER_SECONDS.observe(elapsed, 'summary')
+        record_timing('pdf', elapsed)
         return buffer.getvalue()
     
     def generate_quiz_pdf(self, title: str, questions: list) -> bytes:
+        started = time.perf_counter()
         buffer = io.BytesIO()
         doc = SimpleDocTemplate(buffer, pagesize=A4,
                                rightMargin=50, leftMargin=50,
@@ -154,6 +161,9 @@ class PDFGenerator:
         
         doc.build(story)
         buffer.seek(0)
+        elapsed = time.perf_counter() - started
+        PDF_RENDER_SECONDS.observe(elapsed, 'quiz')
+        record_timing('pdf', elapsed)
         return buffer.getvalue()
     
     def _clean_text(self, text: str) -> str:
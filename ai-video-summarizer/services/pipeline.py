@@ -0,0 +1,223 @@
+import os
+import time
+import logging
+from typing import Callable, Dict, Iterator, Optional, Tuple
+from services.video_processor import canonical_video_id
+from services.concurrency import Task, gather, get_executor, submit
+from services.single_flight import SingleFlight
+from services.llm_gateway import FALLBACK_SOURCE
+from services.quiz_generator import MAX_QUESTIONS
+from services.deadline import Deadline
+from services.metrics import FALLBACKS, stage, observe_stage
+
+logger = logging.getLogger(__name__)
+
+class VideoPipeline:
+    def __init__(self, video_processor, summary_generator, quiz_generator, result_cache=None, single_flight=None):
+        self.video_processor = video_processor
+        self.summary_generator = summary_generator
+        self.quiz_generator = quiz_generator
+        self.result_cache = result_cache
+        self.single_flight = single_flight or SingleFlight()
+        self.summary_timeout = float(os.environ.get('SUMMARY_TIMEOUT', 45))
+        self.quiz_timeout = float(os.environ.get('QUIZ_TIMEOUT', 45))
+        # Seconds of the request budget that extraction leaves for summary
+        # and quiz generation.
+        self.generation_reserve = float(os.environ.get('GENERATION_RESERVE', 20))
+
+    def prepare(self, video_url: str, deadline: Deadline = None) -> Tuple[Dict, bool]:
+        deadline = deadline or Deadline.unbounded()
+        video_id = canonical_video_id(video_url)
+
+        if self.result_cache:
+            with stage('result_cache', timing_name='db'):
+                result = self.result_cache.get(video_id)
+            if result is not None:
+                return result, True
+
+        # Concurrent requests for the same video share one extraction.
+        extract_deadline = deadline.reserve(self.generation_reserve)
+        video_data, _ = self.single_flight.do(
+            f"extract:{video_id}", lambda: self.video_processor.process_url(video_url, extract_deadline),
+            wait_timeout=extract_deadline.timeout(self.single_flight.wait_timeout)
+        )
+        result = {
+            'video_id': video_id,
+            'transcript': video_data['transcript'],
+            'segments': video_data['segments'].to_dict(),
+            'metadata': {
+                'duration': video_data.get('duration', 0),
+                'title': video_data.get('title', 'Untitled'),
+                'channel': video_data.get('channel', 'Unknown'),
+                'language': video_data.get('language', 'en'),
+                'thumbnail': video_data.get('thumbnail', ''),
+                'view_count': video_data.get('view_count', 0),
+                'caption_chars_removed': video_data.get('caption_chars_removed', 0)
+            },
+            # Set when the request budget cut something short; such results
+            # are served to this request but never cached.
+            'degraded': bool(video_data.get('captions_skipped'))
+        }
+        return result, False
+
+    def run(self, video_url: str, on_progress: Optional[Callable[[str, Dict], None]] = None,
+            deadline: Deadline = None) -> Tuple[Dict, bool]:
+        deadline = deadline or Deadline.unbounded()
+        (result, cached), shared = self.single_flight.do(
+            canonical_video_id(video_url), lambda: self._run(video_url, on_progress, deadline),
+            wait_timeout=deadline.timeout(self.single_flight.wait_timeout)
+        )
+        if shared:
+            # Waiters saw none of the leader's progress; hand them the end
+            # state and their own copy of the result.
+            result = dict(result)
+            if on_progress:
+                on_progress('done', result)
+        return result, cached
+
+    def _run(self, video_url: str, on_progress: Optional[Callable[[str, Dict], None]] = None,
+             deadline: Deadline = None) -> Tuple[Dict, bool]:
+        deadline = deadline or Deadline.unbounded()
+        progress = on_progress or (lambda stage, partial: None)
+        result, cached = self.prepare(video_url, deadline)
+        if cached:
+            progress('done', result)
+            return result, True
+
+        progress('extracted', {'metadata': result['metadata']})
+        self._generate(result, deadline, progress)
+        progress('done', result)
+        return result, False
+
+    def _generate(self, result: Dict, deadline: Deadline, progress: Callable[[str, Dict], None] = None) -> Dict:
+        progress = progress or (lambda stage, partial: None)
+        transcript = result['transcript']
+        num_questions = self._num_questions(transcript)
+        max_questions = self._question_cap(result, deadline)
+
+        result['sources'] = {}
+
+        def stage_done(name, outcome):
+            result[name], result['sources'][name] = outcome
+            progress(f"{name}_ready", {key: result[key] for key in ('metadata', 'summary', 'quiz', 'sources') if key in result})
+
+        gather({
+            'summary': Task(
+                fn=lambda: self.summary_generator.generate_with_source(transcript, deadline=deadline),
+                timeout=deadline.timeout(self.summary_timeout),
+                fallback=lambda reason: self._fell_back('summary', reason, self.summary_generator._generate_fallback(transcript, 500))
+            ),
+            'quiz': Task(
+                fn=lambda: self.quiz_generator.generate_with_source(transcript, num_questions=num_questions,
+                                                                    difficulty='medium', deadline=deadline,
+                                                                    max_questions=max_questions),
+                timeout=deadline.timeout(self.quiz_timeout),
+                fallback=lambda reason: self._fell_back('quiz', reason, self.quiz_generator._generate_fallback(transcript, num_questions))
+            ),
+        }, on_done=stage_done)
+
+        self._store(result)
+        return result
+
+    def stream_events(self, result: Dict, deadline: Deadline = None) -> Iterator[Tuple[str, Dict]]:
+        deadline = deadline or Deadline.unbounded()
+        yield 'metadata', {'metadata': result['metadata']}
+
+        # Shares run()'s single-flight key: a burst of requests for one video
+        # makes one set of model calls whichever endpoint each came through.
+        video_id = result['video_id']
+        wait_timeout = deadline.timeout(self.single_flight.wait_timeout)
+        with self.single_flight.lead(video_id, wait_timeout) as (flight, leader):
+            if leader:
+                # A leader in another process may have stored the result
+                # while this one waited for the lock.
+                stored = None
+                if self.result_cache:
+                    with stage('result_cache', timing_name='db'):
+                        stored = self.result_cache.get(video_id)
+                if stored is not None:
+                    flight.set_result((stored, True))
+                    yield 'done', self._done_event(stored, True)
+                    return
+                yield from self._stream_generate(result, deadline)
+                flight.set_result((result, False))
+                yield 'done', self._done_event(result, False)
+                return
+
+        (shared, cached), _ = self.single_flight.follow(
+            video_id, flight, lambda: (self._generate(result, deadline), False), wait_timeout
+        )
+        yield 'done', self._done_event(shared, cached)
+
+    def _stream_generate(self, result: Dict, deadline: Deadline) -> Iterator[Tuple[str, Dict]]:
+        transcript = result['transcript']
+        num_questions = self._num_questions(transcript)
+        quiz_timeout = deadline.timeout(self.quiz_timeout)
+        quiz_started = time.monotonic()
+        quiz_future = submit(
+            get_executor(), self.quiz_generator.generate_with_source, transcript, num_questions=num_questions,
+            difficulty='medium', deadline=deadline, max_questions=self._question_cap(result, deadline)
+        )
+
+        if self.summary_generator.uses_ai(transcript, deadline):
+            parts = []
+            started = time.perf_counter()
+            try:
+                for text in self.summary_generator.stream(transcript, deadline):
+                    parts.append(text)
+                    yield 'token', {'text': text}
+                summary = self.summary_generator.build_result(''.join(parts))
+            except Exception as e:
+                logger.error(f"Summary stream failed, using fallback: {str(e)}")
+                FALLBACKS.inc('summary', 'error')
+                summary = self.summary_generator._generate_fallback(transcript, 500)
+            observe_stage('summary', time.perf_counter() - started)
+        else:
+            summary = self.summary_generator.generate(transcript, deadline=deadline)
+        result['summary'] = summary
+        result['sources'] = {'summary': summary['source']}
+
+        try:
+            remaining = quiz_timeout - (time.monotonic() - quiz_started)
+            result['quiz'], result['sources']['quiz'] = quiz_future.result(timeout=max(0, remaining))
+        except Exception as e:
+            logger.warning(f"Quiz not ready for stream, using fallback: {str(e) or type(e).__name__}")
+            quiz_future.cancel()
+            FALLBACKS.inc('quiz', 'timeout')
+            result['quiz'] = self.quiz_generator._generate_fallback(transcript, num_questions)
+            result['sources']['quiz'] = FALLBACK_SOURCE
+
+        self._store(result)
+
+    def _done_event(self, result: Dict, cached: bool) -> Dict:
+        return {
+            'success': True,
+            'cached': cached,
+            'summary': result['summary'],
+            'quiz': result['quiz'],
+            'sources': result.get('sources', {}),
+            'metadata': result['metadata']
+        }
+
+    def _fell_back(self, stage: str, reason: str, value):
+        FALLBACKS.inc(stage, reason)
+        return value, FALLBACK_SOURCE
+
+    def _num_questions(self, transcript: str) -> int:
+        return 15 if len(transcript) > 3000 else 10
+
+    def _question_cap(self, result: Dict, deadline: Deadline) -> int:
+        max_questions = self.quiz_generator.question_cap(deadline)
+        if max_questions < MAX_QUESTIONS:
+            result['degraded'] = True
+        return max_questions
+
+    def _store(self, result: Dict):
+        # The cache is shared by every user for days, so only complete model
+        # output goes in: nothing the deadline cut short, and no extractive
+        # fallback for either part.
+        sources = result.get('sources', {})
+        if any(sources.get(name) in (None, FALLBACK_SOURCE) for name in ('summary', 'quiz')):
+            result['degraded'] = True
+        if self.result_cache and not result.get('degraded'):
+            self.result_cache.put(result['video_id'], result)
@@ -1,29 +1,69 @@
 import os
 import re
 import json
-from typing import List, Dict
-import google.generativeai as genai
+from typing import List, Dict, Optional, Tuple
+from services.text_chunker import sample_chunks
+from services.llm_gateway import get_gateway, FALLBACK_SOURCE, LLMError
+from services.concurrency import hedge
+from services.deadline import Deadline
+from services.metrics import FALLBACKS, stage
+
+PROMPT_CHAR_LIMIT = 10000
+
+# With less request budget than QUIZ_FULL_BUDGET seconds the model is asked
+# for at most REDUCED_QUESTIONS; below MIN_AI_BUDGET it is not tried.
+QUIZ_FULL_BUDGET = 25.0
+MAX_QUESTIONS = 20
+REDUCED_QUESTIONS = 8
+MIN_AI_BUDGET = 5.0
 
 class QuizGenerator:
     def __init__(self):
-        api_key = os.environ.get("GEMINI_API_KEY")
-        if api_key:
-            genai.configure(api_key=api_key)
-            self.model = genai.GenerativeModel('gemini-1.5-flash')
-        else:
-            self.model = None
+        self.llm = get_gateway()
+        self.hedge_after = float(os.environ.get('QUIZ_HEDGE_AFTER', 20))
+        self.hedge_deadline = float(os.environ.get('QUIZ_DEADLINE', 40))
     
-    def generate(self, text: str, num_questions: int = 10, difficulty: str = 'medium') -> List[Dict]:
-        try:
-            if self.model and len(text) > 50:
-                return self._generate_with_ai(text, num_questions, difficulty)
-            else:
-                return self._generate_fallback(text, num_questions)
-        except Exception as e:
-            print(f"AI Quiz error: {e}")
-            return self._generate_fallback(text, num_questions)
+    def generate(self, text: str, num_questions: int = 10, difficulty: str = 'medium', deadline: Deadline = None) -> List[Dict]:
+        return self.generate_with_source(text, num_questions, difficulty, deadline)[0]
+    
+    def question_cap(self, deadline: Deadline) -> int:
+        return MAX_QUESTIONS if deadline.remaining() >= QUIZ_FULL_BUDGET else REDUCED_QUESTIONS
+    
+    def generate_with_source(self, text: str, num_questions: int = 10, difficulty: str = 'medium',
+                             deadline: Deadline = None, max_questions: int = None) -> Tuple[List[Dict], str]:
+        # Returns the quiz and what produced it: the provider name, or
+        # FALLBACK_SOURCE for the local generator. max_questions defaults to
+        # question_cap(deadline).
+        deadline = deadline or Deadline.unbounded()
+        with stage('quiz'):
+            reason = self._skip_reason(text, deadline)
+            try:
+                if reason is None:
+                    if max_questions is None:
+                        max_questions = self.question_cap(deadline)
+                    quiz, hedged = hedge(
+                        lambda: self._generate_with_ai(text, num_questions, difficulty, max_questions, deadline),
+                        lambda: self._generate_fallback(text, num_questions),
+                        deadline.timeout(self.hedge_after), deadline.timeout(self.hedge_deadline)
+                    )
+                    if hedged:
+                        FALLBACKS.inc('quiz', 'hedge')
+                    return quiz, FALLBACK_SOURCE if hedged else self.llm.source
+            except Exception as e:
+                print(f"AI Quiz error: {e}")
+                reason = 'error'
+            FALLBACKS.inc('quiz', reason)
+            return self._generate_fallback(text, num_questions), FALLBACK_SOURCE
+    
+    def _skip_reason(self, text: str, deadline: Deadline) -> Optional[str]:
+        if len(text) <= 50:
+            return 'short_text'
+        if deadline.remaining() < MIN_AI_BUDGET:
+            return 'deadline'
+        return self.llm.unavailable_reason()
     
-    def _generate_with_ai(self, text: str, num_questions: int, difficulty: str) -> List[Dict]:
+    def _generate_with_ai(self, text: str, num_questions: int, difficulty: str, max_questions: int = MAX_QUESTIONS,
+                          deadline: Deadline = None) -> List[Dict]:
         content_length = len(text)
         if content_length > 5000:
             num_questions = min(20, max(num_questions, 15))
@@ -31,11 +71,12 @@ class QuizGenerator:
             num_questions = min(15, max(num_questions, 10))
         else:
             num_questions = max(num_questions, 8)
+        num_questions = min(num_questions, max_questions)
         
         prompt = f"""Based on this educational content, create {num_questions} quiz questions to test understanding. Create as many questions as possible to cover all the topics.
 
 CONTENT:
-{text[:10000]}
+{sample_chunks(text, PROMPT_CHAR_LIMIT)}
 
 DIFFICULTY: {difficulty}
 
@@ -59,8 +100,7 @@ Respond ONLY with valid JSON in this exact format (no markdown, no code blocks):
   ]
 }}"""
 
-        response = self.model.generate_content(prompt)
-        content = response.text
+        content = self.llm.generate(prompt, timeout=deadline.timeout(self.llm.timeout) if deadline else None)
         
         content = content.strip()
         if content.startswith('```json'):
@@ -78,7 +118,7 @@ Respond ONLY with valid JSON in this exact format (no markdown, no code blocks):
             if json_match:
                 data = json.loads(json_match.group())
             else:
-                return self._generate_fallback(text, num_questions)
+                raise ValueError('Quiz response was not JSON')
         
         questions = data.get('questions', [])
         
@@ -95,7 +135,11 @@ Respond ONLY with valid JSON in this exact format (no markdown, no code blocks):
                     'explanation': q.get('explanation', 'This is the correct answer based on the content.')
                 })
         
-        return formatted_questions if formatted_questions else self._generate_fallback(text, num_questions)
+        if not formatted_questions:
+            # Raised rather than answered locally so the caller reports the
+            # extractive source and counts the fallback.
+            raise LLMError('Quiz response had no usable questions')
+        return formatted_questions
     
     def _generate_fallback(self, text: str, num_questions: int) -> List[Dict]:
         questions = []
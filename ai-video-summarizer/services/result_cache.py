@@ -0,0 +1,91 @@
+import os
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from app import db
+from models import VideoCache
+
+logger = logging.getLogger(__name__)
+
+class ResultCache:
+    def __init__(self, ttl_seconds: int = None, max_entries: int = None, max_bytes: int = None):
+        self.ttl = timedelta(seconds=ttl_seconds or int(os.environ.get('RESULT_CACHE_TTL', 7 * 24 * 3600)))
+        self.max_entries = max_entries or int(os.environ.get('RESULT_CACHE_MAX_ENTRIES', 1000))
+        self.max_bytes = max_bytes or int(os.environ.get('RESULT_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+        # Hits only rewrite last_accessed when it is older than this, so a
+        # popular lecture does not turn every read into a write.
+        self.touch_interval = timedelta(seconds=60)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, video_id: str) -> Optional[Dict]:
+        try:
+            entry = db.session.get(VideoCache, video_id)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            now = datetime.now()
+            if entry.created_at and now - entry.created_at > self.ttl:
+                db.session.delete(entry)
+                db.session.commit()
+                self.misses += 1
+                return None
+
+            if not entry.last_accessed or now - entry.last_accessed > self.touch_interval:
+                entry.last_accessed = now
+                db.session.commit()
+
+            self.hits += 1
+            return json.loads(entry.payload)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Result cache read failed for {video_id}: {str(e)}")
+            return None
+
+    def put(self, video_id: str, result: Dict):
+        try:
+            payload = json.dumps(result)
+            now = datetime.now()
+            entry = VideoCache(
+                video_id=video_id,
+                payload=payload,
+                size_bytes=len(payload.encode('utf-8')),
+                created_at=now,
+                last_accessed=now
+            )
+            db.session.merge(entry)
+            db.session.commit()
+            self._evict()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Result cache write failed for {video_id}: {str(e)}")
+
+    def stats(self) -> Dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses}
+
+    def invalidate(self, video_id: str = None) -> int:
+        query = VideoCache.query
+        if video_id:
+            query = query.filter_by(video_id=video_id)
+        removed = query.delete(synchronize_session=False)
+        db.session.commit()
+        return removed
+
+    def _evict(self):
+        expired_before = datetime.now() - self.ttl
+        VideoCache.query.filter(VideoCache.created_at < expired_before).delete(synchronize_session=False)
+
+        rows = db.session.query(VideoCache.video_id, VideoCache.size_bytes).order_by(VideoCache.last_accessed.desc()).all()
+        total_bytes = 0
+        stale = []
+        for index, (video_id, size_bytes) in enumerate(rows):
+            total_bytes += size_bytes or 0
+            if index >= self.max_entries or total_bytes > self.max_bytes:
+                stale.append(video_id)
+
+        if stale:
+            VideoCache.query.filter(VideoCache.video_id.in_(stale)).delete(synchronize_session=False)
+            logger.info(f"Result cache evicted {len(stale)} entries")
+        db.session.commit()
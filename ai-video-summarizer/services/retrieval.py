@@ -0,0 +1,91 @@
+import os
+import re
+import math
+import hashlib
+from collections import Counter, defaultdict
+from typing import Dict, List, Tuple
+from services.text_chunker import chunk_text
+from services.ttl_cache import TTLCache
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+STOPWORDS = frozenset("""
+a an and are as at be but by can did do does for from had has have he her his how i if in into is it its
+just me my no not of on or our she so than that the their them then there these they this to too us was
+we were what when where which who why will with you your about also very really okay ok um uh like yeah
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS and len(t) > 1]
+
+class BM25Index:
+    def __init__(self, chunks: List[str], k1: float = 1.5, b: float = 0.75):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.lengths = []
+
+        for index, chunk in enumerate(chunks):
+            counts = Counter(tokenize(chunk))
+            self.lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings[term].append((index, tf))
+
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0
+        total = len(chunks)
+        self.idf = {
+            term: math.log(1 + (total - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+
+    def search(self, query: str, top_k: int) -> List[Tuple[int, float]]:
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for index, tf in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[index] / (self.avg_length or 1))
+                scores[index] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+class TranscriptRetriever:
+    def __init__(self, chunk_chars: int = 800, max_indexes: int = None):
+        self.chunk_chars = chunk_chars
+        self.indexes = TTLCache(
+            max_entries=max_indexes or int(os.environ.get('RETRIEVAL_INDEX_CACHE_SIZE', 64)),
+            ttl_seconds=int(os.environ.get('RETRIEVAL_INDEX_TTL', 3600))
+        )
+
+    def index_for(self, key: str, transcript: str) -> BM25Index:
+        index = self.indexes.get(key)
+        if index is None:
+            index = BM25Index(chunk_text(transcript, self.chunk_chars))
+            self.indexes.set(key, index)
+        return index
+
+    def select(self, transcript: str, query: str, key: str = None, token_budget: int = 1200, top_k: int = 8) -> List[str]:
+        # The same video can arrive with different transcripts (re-processed,
+        # or a different caption track), so the key always covers the text.
+        digest = hashlib.sha1(transcript.encode('utf-8')).hexdigest()
+        key = f"{key}:{len(transcript)}:{digest}" if key else digest
+        index = self.index_for(key, transcript)
+        if not index.chunks:
+            return []
+
+        ranked = index.search(query, top_k)
+        if not ranked:
+            # Nothing matched (greetings, "summarize this"): the opening gives
+            # the most general context.
+            ranked = [(0, 0.0)]
+
+        char_budget = token_budget * 4
+        chosen = []
+        for position, _ in ranked:
+            length = len(index.chunks[position])
+            if length > char_budget:
+                continue
+            chosen.append(position)
+            char_budget -= length
+        # Present passages in lecture order so the model sees the flow.
+        return [index.chunks[position] for position in sorted(chosen)]
@@ -0,0 +1,119 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+class Abandoned(Exception):
+    # Set on a key's future when its leader stopped without a result, e.g.
+    # a streaming client disconnected; waiters then do the work themselves.
+    pass
+
+class SingleFlight:
+    # Concurrent calls with the same key share one execution: the first
+    # caller runs fn, the rest wait on its future. With lock_dir set, the
+    # leader also holds an flock on a per-key file so leaders in other
+    # processes (gunicorn workers on the same host) run one at a time;
+    # fn should check a shared cache first so the later ones reuse the
+    # earlier result.
+    def __init__(self, lock_dir: str = None, wait_timeout: float = None):
+        self.lock_dir = lock_dir if lock_dir is not None else os.environ.get('SINGLE_FLIGHT_LOCK_DIR', '')
+        self.wait_timeout = wait_timeout or float(os.environ.get('SINGLE_FLIGHT_WAIT', 180))
+        self._inflight = {}
+        self._lock = threading.Lock()
+        if self.lock_dir:
+            if fcntl is None:
+                logger.warning("fcntl unavailable, single-flight is per-process only")
+                self.lock_dir = ''
+            else:
+                os.makedirs(self.lock_dir, exist_ok=True)
+
+    def do(self, key: str, fn: Callable[[], Any], wait_timeout: float = None) -> Tuple[Any, bool]:
+        wait_timeout = self.wait_timeout if wait_timeout is None else wait_timeout
+        with self.lead(key, wait_timeout) as (future, leader):
+            if leader:
+                value = fn()
+                future.set_result(value)
+                return value, False
+        return self.follow(key, future, fn, wait_timeout)
+
+    @contextmanager
+    def lead(self, key: str, wait_timeout: float = None) -> Iterator[Tuple[Future, bool]]:
+        # The leader side of do() for work that cannot run as one call, such
+        # as a generator streaming to its client. Yields the key's future and
+        # whether the caller leads. A leader settles the future with
+        # set_result(); if its body leaves without doing so, waiters get the
+        # exception, or Abandoned when it was closed early. A non-leader
+        # should pass the future to follow() after the block.
+        wait_timeout = self.wait_timeout if wait_timeout is None else wait_timeout
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+
+        if not leader:
+            yield future, False
+            return
+
+        try:
+            with self._process_lock(key, wait_timeout):
+                yield future, True
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                if self._inflight.get(key) is future:
+                    del self._inflight[key]
+            if not future.done():
+                future.set_exception(Abandoned(f"Leader for '{key}' stopped without a result"))
+
+    def follow(self, key: str, future: Future, fn: Callable[[], Any], wait_timeout: float) -> Tuple[Any, bool]:
+        # Waits for the leader's result; past wait_timeout, or if the leader
+        # gave up, runs fn directly.
+        try:
+            return future.result(timeout=wait_timeout), True
+        except FutureTimeoutError:
+            logger.warning(f"Waited {wait_timeout:.1f}s on in-flight '{key}', running it directly")
+        except Abandoned:
+            logger.info(f"Leader for '{key}' stopped early, running it directly")
+        return fn(), False
+
+    @contextmanager
+    def _process_lock(self, key: str, wait_timeout: float):
+        if not self.lock_dir:
+            yield
+            return
+
+        path = os.path.join(self.lock_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.lock')
+        with open(path, 'a') as handle:
+            deadline = time.monotonic() + wait_timeout
+            locked = False
+            while True:
+                try:
+                    fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    locked = True
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        logger.warning(f"Lock for '{key}' still held after {wait_timeout:.1f}s, proceeding without it")
+                        break
+                    time.sleep(0.1)
+            try:
+                yield
+            finally:
+                if locked:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
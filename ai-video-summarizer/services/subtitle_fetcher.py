@@ -0,0 +1,99 @@
+import os
+import time
+import logging
+from concurrent.futures import wait, FIRST_COMPLETED
+from typing import Any, Callable, Iterable, List, Tuple
+import requests
+from requests.adapters import HTTPAdapter
+from services.concurrency import get_executor
+
+logger = logging.getLogger(__name__)
+
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 10
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+BACKOFF_FACTOR = 0.3
+
+class SubtitleFetcher:
+    def __init__(self, total_budget: float = None, retries: int = 2, pool_size: int = 16):
+        self.total_budget = total_budget or float(os.environ.get('SUBTITLE_FETCH_BUDGET', 15))
+        # Retried here rather than by urllib3's Retry, which sleeps for
+        # whatever Retry-After a 429 asks and cannot see the fetch deadline.
+        self.retries = retries
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def fetch_first(self, tracks: List[Tuple[str, Callable[[Iterable[str]], Any]]], budget: float = None) -> Any:
+        # tracks are (url, parse) pairs in priority order; a repeated url
+        # keeps its first position and parser.
+        parsers = {}
+        for url, parse in tracks:
+            if url:
+                parsers.setdefault(url, parse)
+        if not parsers:
+            return None
+
+        budget = self.total_budget if budget is None else min(budget, self.total_budget)
+        deadline = time.monotonic() + budget
+        executor = get_executor('subtitles')
+        futures = [executor.submit(self._fetch_parsed, url, parse, deadline) for url, parse in parsers.items()]
+        position = {future: index for index, future in enumerate(futures)}
+        results = [None] * len(futures)
+        pending = set(futures)
+
+        # Candidates are raced, but a lower-priority track only wins once
+        # every track ahead of it has come back empty.
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logger.warning(f"Subtitle fetch budget of {budget:.1f}s exhausted")
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    results[position[future]] = future.result() or False
+                except Exception as e:
+                    logger.info(f"Subtitle track failed: {str(e)}")
+                    results[position[future]] = False
+
+            best = self._best_resolved(results)
+            if best:
+                break
+
+        for future in pending:
+            future.cancel()
+        return self._best_resolved(results) or next((parsed for parsed in results if parsed), None)
+
+    def _best_resolved(self, results: List[Any]) -> Any:
+        for parsed in results:
+            if parsed is None:
+                return None
+            if parsed:
+                return parsed
+        return None
+
+    def _fetch_parsed(self, url: str, parse: Callable[[Iterable[str]], Any], deadline: float) -> Any:
+        for attempt in range(self.retries + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            timeout = (CONNECT_TIMEOUT, min(READ_TIMEOUT, remaining))
+            try:
+                with self.session.get(url, timeout=timeout, stream=True) as response:
+                    if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                        response.raise_for_status()
+                        response.encoding = response.encoding or 'utf-8'
+                        return parse(response.iter_content(chunk_size=64 * 1024, decode_unicode=True))
+                    error = f"HTTP {response.status_code}"
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.retries:
+                    raise
+                error = type(e).__name__
+            delay = BACKOFF_FACTOR * (2 ** attempt)
+            if time.monotonic() + delay >= deadline:
+                logger.info(f"Subtitle track {error}, no time left to retry")
+                return None
+            time.sleep(delay)
+        return None
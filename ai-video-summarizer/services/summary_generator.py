@@ -1,32 +1,122 @@
 import os
 import re
-from typing import List, Dict
-import google.generativeai as genai
+from typing import List, Dict, Iterator, Optional, Tuple
+from services.text_chunker import chunk_text
+from services.concurrency import get_executor, hedge
+from services.llm_gateway import get_gateway, FALLBACK_SOURCE
+from services.deadline import Deadline
+from services.metrics import FALLBACKS, stage
+
+# Transcripts up to PROMPT_CHAR_LIMIT go to the model in one prompt. Longer
+# ones are summarized chunk by chunk in parallel and the partial notes are
+# merged, repeating on the notes until they fit.
+PROMPT_CHAR_LIMIT = 12000
+MAP_CHUNK_CHARS = 8000
+MAX_REDUCE_ROUNDS = 3
+
+# Below this many seconds of request budget the model is not tried at all.
+MIN_AI_BUDGET = 5.0
 
 class SummaryGenerator:
     def __init__(self):
-        api_key = os.environ.get("GEMINI_API_KEY")
-        if api_key:
-            genai.configure(api_key=api_key)
-            self.model = genai.GenerativeModel('gemini-1.5-flash')
-        else:
-            self.model = None
+        self.llm = get_gateway()
+        # Past hedge_after the extractive summary is built on the request
+        # thread and used unless the model has finished meanwhile.
+        # Transcripts that need a map-reduce pass get twice as long.
+        self.hedge_after = float(os.environ.get('SUMMARY_HEDGE_AFTER', 20))
+        self.hedge_deadline = float(os.environ.get('SUMMARY_DEADLINE', 40))
     
-    def generate(self, text: str, max_length: int = 500) -> Dict:
-        try:
-            if self.model and len(text) > 50:
-                return self._generate_with_ai(text)
-            else:
-                return self._generate_fallback(text, max_length)
-        except Exception as e:
-            print(f"AI Summary error: {e}")
+    def uses_ai(self, text: str, deadline: Deadline = None) -> bool:
+        return self._skip_reason(text, deadline or Deadline.unbounded()) is None
+    
+    def generate(self, text: str, max_length: int = 500, deadline: Deadline = None) -> Dict:
+        deadline = deadline or Deadline.unbounded()
+        with stage('summary'):
+            reason = self._skip_reason(text, deadline)
+            try:
+                if reason is None:
+                    scale = 2 if len(text) > PROMPT_CHAR_LIMIT else 1
+                    summary, hedged = hedge(
+                        lambda: self._generate_with_ai(text, deadline),
+                        lambda: self._generate_fallback(text, max_length),
+                        deadline.timeout(self.hedge_after * scale), deadline.timeout(self.hedge_deadline * scale)
+                    )
+                    if hedged:
+                        FALLBACKS.inc('summary', 'hedge')
+                    return summary
+            except Exception as e:
+                print(f"AI Summary error: {e}")
+                reason = 'error'
+            FALLBACKS.inc('summary', reason)
             return self._generate_fallback(text, max_length)
     
-    def _generate_with_ai(self, text: str) -> Dict:
-        prompt = f"""You are an expert educational content summarizer. Analyze this video lecture content and provide a comprehensive educational summary in simple English that students can easily understand.
+    def _skip_reason(self, text: str, deadline: Deadline) -> Optional[str]:
+        if len(text) <= 50:
+            return 'short_text'
+        if deadline.remaining() < MIN_AI_BUDGET:
+            return 'deadline'
+        return self.llm.unavailable_reason()
+    
+    def generate_with_source(self, text: str, max_length: int = 500, deadline: Deadline = None) -> Tuple[Dict, str]:
+        summary = self.generate(text, max_length, deadline)
+        return summary, summary['source']
+    
+    def stream(self, text: str, deadline: Deadline = None) -> Iterator[str]:
+        deadline = deadline or Deadline.unbounded()
+        content = self._condense(text, deadline)
+        deadline.check('summary')
+        yield from self.llm.stream(self._build_prompt(content), timeout=deadline.timeout(self.llm.timeout))
+    
+    def build_result(self, content: str) -> Dict:
+        return {
+            'full_summary': content,
+            'key_points': self._extract_key_points(content),
+            'word_count': len(content.split()),
+            'ai_generated': True,
+            'source': self.llm.source
+        }
+    
+    def _generate_with_ai(self, text: str, deadline: Deadline = None) -> Dict:
+        deadline = deadline or Deadline.unbounded()
+        content = self._condense(text, deadline)
+        deadline.check('summary')
+        return self.build_result(self.llm.generate(self._build_prompt(content), timeout=deadline.timeout(self.llm.timeout)))
+    
+    def _condense(self, text: str, deadline: Deadline = None) -> str:
+        deadline = deadline or Deadline.unbounded()
+        rounds = 0
+        while len(text) > PROMPT_CHAR_LIMIT and rounds < MAX_REDUCE_ROUNDS:
+            chunks = chunk_text(text, MAP_CHUNK_CHARS)
+            deadline.check('summary map pass')
+            notes = list(get_executor('summary_map').map(
+                lambda args: self._summarize_chunk(*args, deadline=deadline),
+                [(i + 1, len(chunks), chunk) for i, chunk in enumerate(chunks)]
+            ))
+            text = '\n\n'.join(notes)
+            rounds += 1
+        return text
+    
+    def _summarize_chunk(self, index: int, total: int, chunk: str, deadline: Deadline = None) -> str:
+        prompt = f"""You are taking study notes on part {index} of {total} of a video lecture.
+
+LECTURE PART {index}:
+{chunk}
+
+Write concise notes for this part only, in simple English:
+- The topics and headings covered
+- Every definition, with the term in bold
+- Examples, case studies or demonstrations mentioned
+- Important points a student must remember
+
+Keep technical terms exactly as used. Do not add an introduction or conclusion."""
+        timeout = deadline.timeout(self.llm.timeout) if deadline else None
+        return f"[Part {index} of {total}]\n{self.llm.generate(prompt, timeout=timeout).strip()}"
+    
+    def _build_prompt(self, text: str) -> str:
+        return f"""You are an expert educational content summarizer. Analyze this video lecture content and provide a comprehensive educational summary in simple English that students can easily understand.
 
 VIDEO CONTENT:
-{text[:12000]}
+{text[:PROMPT_CHAR_LIMIT]}
 
 Please provide your response in this EXACT format:
 
@@ -58,18 +148,6 @@ Remember to:
 - Explain technical terms clearly
 - Include all important headings and topics
 - Make it educational and helpful for students"""
-
-        response = self.model.generate_content(prompt)
-        content = response.text
-        
-        key_points = self._extract_key_points(content)
-        
-        return {
-            'full_summary': content,
-            'key_points': key_points,
-            'word_count': len(content.split()),
-            'ai_generated': True
-        }
     
     def _extract_key_points(self, content: str) -> List[str]:
         points = []
@@ -111,7 +189,8 @@ Remember to:
             'full_summary': full_summary,
             'key_points': key_points,
             'word_count': len(full_summary.split()),
-            'ai_generated': False
+            'ai_generated': False,
+            'source': FALLBACK_SOURCE
         }
     
     def _clean_text(self, text: str) -> str:
@@ -0,0 +1,74 @@
+import re
+from typing import List
+
+PARAGRAPH_RE = re.compile(r'\n\s*\n')
+SENTENCE_RE = re.compile(r'(?<=[.!?])\s+')
+
+def split_units(text: str) -> List[str]:
+    units = []
+    for paragraph in PARAGRAPH_RE.split(text):
+        paragraph = paragraph.strip()
+        if paragraph:
+            units.extend(s.strip() for s in SENTENCE_RE.split(paragraph) if s.strip())
+    return units
+
+def chunk_text(text: str, max_chars: int) -> List[str]:
+    chunks = []
+    current = []
+    current_len = 0
+
+    def flush():
+        nonlocal current, current_len
+        if current:
+            chunks.append(' '.join(current))
+        current = []
+        current_len = 0
+
+    for unit in split_units(text):
+        # Auto-captions often have no punctuation at all, so a single
+        # "sentence" can be the whole transcript; fall back to word breaks.
+        pieces = [unit] if len(unit) <= max_chars else _split_on_words(unit, max_chars)
+        for piece in pieces:
+            if current_len + len(piece) + 1 > max_chars:
+                flush()
+            current.append(piece)
+            current_len += len(piece) + 1
+    flush()
+    return chunks
+
+def sample_chunks(text: str, budget: int, chunk_size: int = 2000, min_share: int = 200) -> str:
+    # Takes the opening of every chunk, shared out evenly. When there are
+    # too many chunks for each to get min_share characters, every k-th
+    # chunk is used instead, still spread from the first to the last.
+    if len(text) <= budget:
+        return text
+    chunks = chunk_text(text, chunk_size)
+    if len(chunks) * min_share > budget:
+        count = max(1, budget // min_share)
+        if count == 1:
+            chunks = chunks[:1]
+        else:
+            chunks = [chunks[round(i * (len(chunks) - 1) / (count - 1))] for i in range(count)]
+    separators = 2 * (len(chunks) - 1)
+    share = max(1, (budget - separators) // len(chunks))
+    sampled = []
+    for chunk in chunks:
+        if len(chunk) <= share:
+            sampled.append(chunk)
+        else:
+            cut = chunk.rfind(' ', 0, share)
+            sampled.append(chunk[:cut if cut > 0 else share])
+    return '\n\n'.join(sampled)[:budget]
+
+def _split_on_words(text: str, max_chars: int) -> List[str]:
+    pieces = []
+    start = 0
+    while start < len(text):
+        end = min(len(text), start + max_chars)
+        if end < len(text):
+            space = text.rfind(' ', start, end)
+            if space > start:
+                end = space
+        pieces.append(text[start:end].strip())
+        start = end
+    return [p for p in pieces if p]
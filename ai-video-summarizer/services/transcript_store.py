@@ -0,0 +1,90 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import importlib
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+class TranscriptStore(ABC):
+    @abstractmethod
+    def put(self, user_id: str, video_id: str, record: Dict):
+        pass
+
+    @abstractmethod
+    def get(self, user_id: str, video_id: str) -> Optional[Dict]:
+        pass
+
+    @abstractmethod
+    def delete(self, user_id: str, video_id: str):
+        pass
+
+    def _encode(self, record: Dict) -> bytes:
+        return zlib.compress(json.dumps(record).encode('utf-8'), 6)
+
+    def _decode(self, blob: bytes) -> Dict:
+        return json.loads(zlib.decompress(blob).decode('utf-8'))
+
+class SQLiteTranscriptStore(TranscriptStore):
+    def __init__(self, path: str = None, ttl_seconds: int = None):
+        self.path = path or os.environ.get('TRANSCRIPT_STORE_PATH', os.path.join('instance', 'transcripts.sqlite3'))
+        self.ttl = ttl_seconds or int(os.environ.get('TRANSCRIPT_STORE_TTL', 30 * 24 * 3600))
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS transcripts ('
+                ' user_id TEXT NOT NULL,'
+                ' video_id TEXT NOT NULL,'
+                ' payload BLOB NOT NULL,'
+                ' updated_at REAL NOT NULL,'
+                ' PRIMARY KEY (user_id, video_id))'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_transcripts_updated ON transcripts (updated_at)')
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def put(self, user_id: str, video_id: str, record: Dict):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO transcripts (user_id, video_id, payload, updated_at) VALUES (?, ?, ?, ?)',
+                (user_id, video_id, self._encode(record), now)
+            )
+            conn.execute('DELETE FROM transcripts WHERE updated_at < ?', (now - self.ttl,))
+
+    def get(self, user_id: str, video_id: str) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT payload, updated_at FROM transcripts WHERE user_id = ? AND video_id = ?',
+                (user_id, video_id)
+            ).fetchone()
+        if row is None or row[1] < time.time() - self.ttl:
+            return None
+        return self._decode(row[0])
+
+    def delete(self, user_id: str, video_id: str):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM transcripts WHERE user_id = ? AND video_id = ?', (user_id, video_id))
+
+def create_transcript_store(backend: str = None) -> TranscriptStore:
+    backend = backend or os.environ.get('TRANSCRIPT_STORE_BACKEND', 'sqlite')
+    if backend == 'sqlite':
+        return SQLiteTranscriptStore()
+    # A shared store (Redis, S3, ...) plugs in as "package.module:ClassName".
+    module_name, _, class_name = backend.partition(':')
+    store_class = getattr(importlib.import_module(module_name), class_name)
+    if not (isinstance(store_class, type) and issubclass(store_class, TranscriptStore)):
+        raise TypeError(f"TRANSCRIPT_STORE_BACKEND '{backend}' is not a TranscriptStore subclass")
+    return store_class()
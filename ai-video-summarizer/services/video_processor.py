@@ -1,26 +1,68 @@
-import yt_dlp
 import os
 import re
-import requests
+import hashlib
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from functools import partial
+from urllib.parse import urlparse, parse_qs
+from services.extractor_pool import ExtractorPool
+from services.subtitle_fetcher import SubtitleFetcher
+from services.caption_parser import SegmentTable, parse_captions
+from services.concurrency import get_executor
+from services.deadline import Deadline, DeadlineExceeded
+from services.metrics import stage
+
+# Below this many seconds of budget, captions are skipped and the transcript
+# is built from metadata alone.
+MIN_CAPTION_BUDGET = 2.0
+
+YOUTUBE_ID_RE = re.compile(r'^[A-Za-z0-9_-]{11}$')
+YOUTUBE_HOSTS = ('youtube.com', 'www.youtube.com', 'm.youtube.com', 'music.youtube.com', 'youtube-nocookie.com', 'www.youtube-nocookie.com')
+
+def canonical_video_id(url: str) -> str:
+    url = (url or '').strip()
+    if not re.match(r'^[a-z]+://', url, re.IGNORECASE):
+        url = 'https://' + url
+    parsed = urlparse(url)
+    host = (parsed.hostname or '').lower()
+    path_parts = [p for p in parsed.path.split('/') if p]
+    candidate = None
+
+    if host in ('youtu.be', 'www.youtu.be') and path_parts:
+        candidate = path_parts[0]
+    elif host in YOUTUBE_HOSTS:
+        query = parse_qs(parsed.query)
+        if query.get('v'):
+            candidate = query['v'][0]
+        elif len(path_parts) >= 2 and path_parts[0] in ('shorts', 'embed', 'live', 'v', 'e'):
+            candidate = path_parts[1]
+
+    if candidate and YOUTUBE_ID_RE.match(candidate):
+        return f"yt:{candidate}"
+
+    normalized = f"{host}{parsed.path.rstrip('/')}?{parsed.query}"
+    return f"url:{hashlib.sha1(normalized.encode('utf-8')).hexdigest()}"
 
 class VideoProcessor:
     def __init__(self):
+        ydl_opts = {
+            'quiet': True,
+            'no_warnings': True,
+            'skip_download': True,
+            'writesubtitles': True,
+            'writeautomaticsub': True,
+            'subtitleslangs': ['en', 'en-US', 'en-GB', 'hi', 'auto'],
+            'subtitlesformat': 'json3',
+            'socket_timeout': 10,
+        }
+        self.extract_timeout = float(os.environ.get('YTDLP_TIMEOUT', 30))
+        self.extractor_pool = ExtractorPool(ydl_opts)
+        self.subtitle_fetcher = SubtitleFetcher()
         print("Video processor initialized")
     
-    def process_url(self, url):
+    def process_url(self, url, deadline: Deadline = None):
+        deadline = deadline or Deadline.unbounded()
         try:
-            ydl_opts = {
-                'quiet': True,
-                'no_warnings': True,
-                'skip_download': True,
-                'writesubtitles': True,
-                'writeautomaticsub': True,
-                'subtitleslangs': ['en', 'en-US', 'en-GB', 'hi', 'auto'],
-                'subtitlesformat': 'json3',
-            }
-            
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
+            info = self._extract_info(url, deadline)
             
             duration = info.get('duration', 0)
             title = info.get('title', 'Unknown Title')
@@ -28,72 +70,78 @@ class VideoProcessor:
             channel = info.get('channel', info.get('uploader', 'Unknown'))
             thumbnail = info.get('thumbnail', '')
             
-            transcript = self._extract_transcript(info)
+            segments, captions_skipped = self._extract_transcript(info, deadline)
+            segments = segments or SegmentTable()
+            transcript = segments.transcript
+            if segments.removed_chars:
+                print(f"Removed {segments.removed_chars} repeated caption characters")
             
             if not transcript or len(transcript) < 100:
                 transcript = self._build_content_from_metadata(info)
+                segments = SegmentTable()
             
             return {
                 'transcript': transcript,
-                'segments': [],
+                'segments': segments,
+                'caption_chars_removed': segments.removed_chars,
                 'duration': duration,
                 'title': title,
                 'channel': channel,
                 'language': info.get('language', 'en') or 'en',
                 'thumbnail': thumbnail,
                 'view_count': info.get('view_count', 0),
-                'description': description[:500] if description else ''
+                'description': description[:500] if description else '',
+                'captions_skipped': captions_skipped
             }
                 
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             raise Exception(f"Error processing video URL: {str(e)}")
     
-    def _extract_transcript(self, info):
-        transcript_text = ""
+    def _extract_info(self, url, deadline):
+        deadline.check('video extraction')
+        timeout = deadline.timeout(self.extract_timeout)
+        future = get_executor('extract').submit(self.extractor_pool.extract, url, cache_key=canonical_video_id(url))
+        try:
+            with stage('extract'):
+                return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # yt-dlp cannot be interrupted; socket_timeout bounds how long the
+            # abandoned call keeps its worker.
+            raise DeadlineExceeded(f"Video extraction did not finish within {timeout:.0f}s")
+    
+    def _extract_transcript(self, info, deadline):
         subtitles = info.get('subtitles', {})
         auto_captions = info.get('automatic_captions', {})
         all_subs = {**subtitles, **auto_captions}
         preferred_langs = ['en', 'en-US', 'en-GB', 'en-orig', 'hi']
         
+        # Only automatic captions repeat each line in the next cue, so only
+        # they are deduplicated; an uploaded track keeps intended repeats.
+        def parser(lang):
+            return partial(parse_captions, dedupe=lang in auto_captions)
+        
+        candidates = []
         for lang in preferred_langs:
-            if lang in all_subs:
-                sub_data = all_subs[lang]
-                if isinstance(sub_data, list):
-                    for sub in sub_data:
-                        if sub.get('ext') == 'json3' or sub.get('ext') == 'vtt':
-                            transcript_text = self._parse_subtitle_url(sub.get('url', ''))
-                            if transcript_text:
-                                return transcript_text
+            sub_data = all_subs.get(lang)
+            if isinstance(sub_data, list):
+                for sub in sub_data:
+                    if sub.get('ext') == 'json3' or sub.get('ext') == 'vtt':
+                        candidates.append((sub.get('url', ''), parser(lang)))
         
         if all_subs:
             first_lang = list(all_subs.keys())[0]
             sub_data = all_subs[first_lang]
             if isinstance(sub_data, list) and sub_data:
-                transcript_text = self._parse_subtitle_url(sub_data[0].get('url', ''))
+                candidates.append((sub_data[0].get('url', ''), parser(first_lang)))
         
-        return transcript_text
-    
-    def _parse_subtitle_url(self, url):
-        if not url:
-            return ""
-        try:
-            response = requests.get(url, timeout=10)
-            content = response.text
-            text_parts = []
-            lines = content.split('\n')
-            
-            for line in lines:
-                line = line.strip()
-                if line and not line.startswith('WEBVTT') and not '-->' in line:
-                    if not re.match(r'^\d+$', line) and not re.match(r'^\d{2}:\d{2}', line):
-                        clean_line = re.sub(r'<[^>]+>', '', line)
-                        clean_line = re.sub(r'\{[^}]+\}', '', clean_line)
-                        if clean_line and len(clean_line) > 1:
-                            text_parts.append(clean_line)
-            
-            return ' '.join(text_parts)
-        except:
-            return ""
+        budget = deadline.timeout(self.subtitle_fetcher.total_budget)
+        if candidates and budget < MIN_CAPTION_BUDGET:
+            print(f"Skipping captions, {budget:.1f}s left in the request budget")
+            return None, True
+        with stage('subtitles'):
+            return self.subtitle_fetcher.fetch_first(candidates, budget=budget), False
     
     def _build_content_from_metadata(self, info):
         parts = []
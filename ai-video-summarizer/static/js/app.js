@@ -46,6 +46,11 @@ document.addEventListener('DOMContentLoaded', function() {
         loadingSection.style.display = 'block';
         resultsSection.style.display = 'none';
 
+        if (window.ReadableStream && window.TextDecoder) {
+            streamVideo(url);
+            return;
+        }
+
         try {
             const response = await fetch('/api/process_video', {
                 method: 'POST',
@@ -79,6 +84,96 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
 
+    async function streamVideo(url) {
+        // Read with fetch rather than EventSource: a request refused before
+        // the stream starts (400, 429, 503, 504) comes back as plain JSON,
+        // and EventSource hides its status, message and Retry-After.
+        let streamedText = '';
+
+        const handlers = {
+            metadata(data) {
+                loadingSection.style.display = 'none';
+                displayResults({ metadata: data.metadata });
+            },
+            token(data) {
+                streamedText += data.text;
+                summaryContent.innerHTML = formatMarkdown(streamedText);
+            },
+            done(data) {
+                currentData = {
+                    title: data.metadata.title,
+                    summary: data.summary,
+                    quiz: data.quiz
+                };
+                loadingSection.style.display = 'none';
+                displayResults(data);
+                showToast('Video analyzed successfully!', 'success');
+            },
+            error(data) {
+                throw new Error(data.error || 'Failed to process video');
+            }
+        };
+
+        try {
+            const response = await fetch(`/api/process_video/stream?url=${encodeURIComponent(url)}`, {
+                headers: { 'Accept': 'text/event-stream' }
+            });
+
+            const contentType = response.headers.get('Content-Type') || '';
+            if (!response.ok || !contentType.startsWith('text/event-stream')) {
+                const data = await response.json().catch(() => ({}));
+                let message = data.error || 'Failed to process video';
+                const retryAfter = response.headers.get('Retry-After');
+                if (retryAfter) {
+                    message += ` (try again in ${retryAfter}s)`;
+                }
+                throw new Error(message);
+            }
+
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let finished = false;
+
+            while (!finished) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+
+                let boundary;
+                while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                    const block = buffer.slice(0, boundary);
+                    buffer = buffer.slice(boundary + 2);
+
+                    let event = 'message';
+                    const dataLines = [];
+                    block.split('\n').forEach(line => {
+                        if (line.startsWith('event:')) event = line.slice(6).trim();
+                        else if (line.startsWith('data:')) dataLines.push(line.slice(5).trimStart());
+                    });
+                    if (!handlers[event] || !dataLines.length) continue;
+
+                    handlers[event](JSON.parse(dataLines.join('\n')));
+                    if (event === 'done') {
+                        finished = true;
+                        reader.cancel();
+                        break;
+                    }
+                }
+            }
+
+            if (!finished) {
+                throw new Error('Connection lost while processing video');
+            }
+
+        } catch (error) {
+            console.error('Error:', error);
+            showToast(error.message, 'error');
+            loadingSection.style.display = 'none';
+            inputSection.style.display = 'block';
+        }
+    }
+
     function isValidUrl(url) {
         const youtubeRegex = /^(https?:\/\/)?(www\.)?(youtube\.com|youtu\.be)\/.+/;
         return youtubeRegex.test(url);
@@ -0,0 +1,21 @@
+from services.caption_parser import parse_vtt
+
+def test_line_of_spaces_does_not_end_a_cue():
+    vtt = [
+        'WEBVTT',
+        '',
+        '00:00:01.000 --> 00:00:04.000',
+        'first line',
+        ' ',
+        'second line',
+        '',
+        '00:00:04.000 --> 00:00:06.000',
+        'next cue',
+    ]
+    table = parse_vtt(vtt)
+    assert 'first line second line' in table.transcript
+    assert 'next cue' in table.transcript
+
+def test_crlf_blank_line_ends_a_cue():
+    vtt = ['WEBVTT\r', '\r', '00:00:01.000 --> 00:00:02.000\r', 'one\r', '\r', 'stray text\r']
+    assert parse_vtt(vtt).transcript == 'one'
@@ -0,0 +1,29 @@
+from services.text_chunker import chunk_text, sample_chunks
+
+def lecture(chars: int, word: str) -> str:
+    sentence = f"The lecturer explains {word} with a worked example on the board. "
+    return sentence * (chars // len(sentence))
+
+def test_short_text_is_returned_whole():
+    text = lecture(5000, 'gradients')
+    assert sample_chunks(text, 10000) == text
+
+def test_sample_stays_within_budget():
+    for size in (20000, 200000, 400000):
+        assert len(sample_chunks(lecture(size, 'gradients'), 10000)) <= 10000
+
+def test_marker_in_last_tenth_of_long_text_survives():
+    text = lecture(360000, 'gradients') + lecture(40000, 'zebrafish')
+    assert len(text) > 390000
+    sample = sample_chunks(text, 10000)
+    assert 'gradients' in sample
+    assert 'zebrafish' in sample
+
+def test_every_chunk_contributes_when_budget_allows():
+    text = ''.join(lecture(2000, f"topic{i}") for i in range(20))
+    sample = sample_chunks(text, 10000)
+    for i in range(20):
+        assert f"topic{i} " in sample
+
+def test_chunks_respect_max_chars():
+    assert all(len(chunk) <= 2000 for chunk in chunk_text(lecture(50000, 'gradients'), 2000))
@@ -0,0 +1,55 @@
+from app import app, db
+from services.video_processor import VideoProcessor
+from services.summary_generator import SummaryGenerator
+from services.quiz_generator import QuizGenerator
+from services.result_cache import ResultCache
+from services.pipeline import VideoPipeline
+from services.job_queue import JobQueue, LANE_PRIORITIES
+import argparse
+import logging
+import os
+import socket
+import time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def run_worker(lanes, poll_interval):
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    queue = JobQueue()
+    pipeline = VideoPipeline(VideoProcessor(), SummaryGenerator(), QuizGenerator(), ResultCache())
+    last_reap = 0.0
+
+    logger.info(f"Worker {worker_id} polling lanes: {', '.join(lanes)}")
+    with app.app_context():
+        while True:
+            if time.monotonic() - last_reap > 60:
+                queue.requeue_stale()
+                last_reap = time.monotonic()
+
+            job = queue.claim(worker_id, lanes)
+            if job is None:
+                time.sleep(poll_interval)
+                continue
+
+            job_id = job.id
+            logger.info(f"Processing job {job_id} ({job.lane}): {job.video_url}")
+            try:
+                result, cached = pipeline.run(
+                    job.video_url,
+                    on_progress=lambda stage, partial: queue.update_progress(job_id, stage, partial)
+                )
+                result['cached'] = cached
+                queue.complete(job_id, result)
+            except Exception as e:
+                logger.error(f"Job {job_id} failed: {str(e)}")
+                db.session.rollback()
+                queue.fail(job_id, str(e))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Process queued video jobs")
+    parser.add_argument('--lanes', default=','.join(LANE_PRIORITIES),
+                        help="Comma-separated lanes to claim from, highest priority first")
+    parser.add_argument('--poll-interval', type=float, default=1.0)
+    args = parser.parse_args()
+    run_worker([lane.strip() for lane in args.lanes.split(',') if lane.strip()], args.poll_interval)